@@ -14,47 +14,285 @@ pip install requests dnspython python-whois beautifulsoup4 Flask lxml
 HaveIBeenPwned: necesitas una API key en HIBP_API_KEY (poner en config).
 """
 
+# Heavy dependencies (requests, whois, dnspython, bs4, Flask, ElementTree) are imported
+# inside the functions that use them, so a run only pays for the modules it executes.
 import json
-import requests
+import os
+import re
+import sys
+import csv
+import argparse
+import hashlib
+import importlib
+import uuid
+import base64
+import sqlite3
 import socket
-import whois
-import dns.resolver
-from bs4 import BeautifulSoup
-from flask import Flask, request, jsonify, render_template_string, send_file
-from io import BytesIO
-import xml.etree.ElementTree as ET
+import threading
 from datetime import datetime
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse, urljoin, quote
 
 # ------------------------- Utilities ---------------------------------
 
-def safe_get(url, timeout=10, headers=None):
-    try:
-        r = requests.get(url, timeout=timeout, headers=headers or {})
-        r.raise_for_status()
-        return r
-    except Exception as e:
-        return None
+_optional_modules = {}
+
+def optional_import(name):
+    """Import an optional dependency on first use; None if it is not installed."""
+    if name not in _optional_modules:
+        try:
+            _optional_modules[name] = importlib.import_module(name)
+        except ImportError:
+            _optional_modules[name] = None
+    return _optional_modules[name]
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a request may be sent."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+# ------------------------- Instrumentation ---------------------------
+
+# Histogram buckets (seconds) exposed on /metrics
+METRIC_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Metrics:
+    """Process-wide counters and histograms, rendered in the Prometheus text format."""
+
+    def __init__(self, buckets=METRIC_BUCKETS):
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self.lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    h['buckets'][i] += 1
+            h['sum'] += value
+            h['count'] += 1
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        items = list(labels) + list(extra)
+        if not items:
+            return ''
+        esc = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        return '{' + ','.join(f'{k}="{esc(v)}"' for k, v in items) + '}'
+
+    def render(self):
+        lines = []
+        with self.lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f'# TYPE {name} counter')
+                    typed.add(name)
+                lines.append(f'{name}{self._labels(labels)} {value}')
+            for (name, labels), h in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f'# TYPE {name} histogram')
+                    typed.add(name)
+                for bound, count in zip(self.buckets, h['buckets']):
+                    lines.append(f'{name}_bucket{self._labels(labels, [("le", bound)])} {count}')
+                lines.append(f'{name}_bucket{self._labels(labels, [("le", "+Inf")])} {h["count"]}')
+                lines.append(f'{name}_sum{self._labels(labels)} {h["sum"]}')
+                lines.append(f'{name}_count{self._labels(labels)} {h["count"]}')
+        return '\n'.join(lines) + '\n'
+
+METRICS = Metrics()
+
+class ModuleTrace:
+    """Collects the outbound requests of one module run (passed to modules as config['_trace']).
+    Totals cover every request; only the first max_events are kept individually.
+    """
+
+    def __init__(self, module, max_events=200):
+        self.module = module
+        self.max_events = max_events
+        self.events = []
+        self.totals = {'requests': 0, 'bytes': 0, 'errors': 0, 'timeouts': 0, 'retries': 0}
+        self.profile = None
+        self.lock = threading.Lock()
+
+    def add(self, event):
+        with self.lock:
+            self.totals['requests'] += 1
+            self.totals['bytes'] += event['bytes']
+            self.totals['retries'] += event['retries']
+            self.totals['timeouts'] += 1 if event['timeout'] else 0
+            self.totals['errors'] += 1 if event['error'] else 0
+            if len(self.events) < self.max_events:
+                self.events.append(event)
+
+def _is_timeout(exc):
+    return isinstance(exc, TimeoutError) or 'timeout' in type(exc).__name__.lower()
+
+_URL_QUERY_RE = re.compile(r'\?[^\s\'"<>()]+')
+
+def strip_query(text):
+    """Drop URL query strings (where some APIs take their key) from a URL or an error message."""
+    return _URL_QUERY_RE.sub('', text) if text else text
+
+def record_request(config, url, status=None, nbytes=0, elapsed=0.0, retries=0, exc=None):
+    """Record one outbound request in the module trace (if any) and in METRICS."""
+    trace = config.get('_trace') if config else None
+    module = trace.module if trace else 'none'
+    # query strings are never recorded: traces end up in reports, archives and job streams
+    event = {'url': strip_query(url), 'status': status, 'bytes': nbytes, 'ms': round(elapsed * 1000, 1),
+             'retries': retries, 'timeout': bool(exc is not None and _is_timeout(exc)),
+             'error': strip_query(f'{type(exc).__name__}: {exc}') if exc is not None else None}
+    if trace:
+        trace.add(event)
+    METRICS.inc('osint_http_requests_total', {'module': module, 'status': status if status is not None else 'error'})
+    METRICS.observe('osint_http_request_duration_seconds', {'module': module}, elapsed)
+    if nbytes:
+        METRICS.inc('osint_http_bytes_total', {'module': module}, nbytes)
+    if retries:
+        METRICS.inc('osint_http_retries_total', {'module': module}, retries)
+    if event['timeout']:
+        METRICS.inc('osint_http_timeouts_total', {'module': module})
 
 # ------------------------- Modules -----------------------------------
 # Each module implements run(target, config) -> dict
 
 # 1) HaveIBeenPwned (email breaches)
 
+HIBP_BASE = 'https://haveibeenpwned.com/api/v3'
+HIBP_RPM = 10           # requests/minute of the API key tier; override with config['hibp_rpm']
+HIBP_CATALOG_TTL = 24 * 3600
+
+class HIBPScheduler:
+    """Shared HIBP client for one API key.
+    All jobs using the key queue on the same token bucket (sized to the key's tier),
+    reuse one HTTP session, and a 429 pauses every caller for the Retry-After
+    interval before the throttled call is retried instead of failing.
+    """
+
+    def __init__(self, api_key=None, rpm=HIBP_RPM, base=HIBP_BASE, max_retries=5, timeout=10):
+        import requests
+        self.base = base
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'osint-tool/1.0'
+        if api_key:
+            self.session.headers['hibp-api-key'] = api_key
+        self.bucket = TokenBucket(rpm / 60.0, capacity=1)
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _wait_pause(self):
+        while True:
+            with self.lock:
+                delay = self.paused_until - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def get(self, path, params=None, config=None):
+        for attempt in range(self.max_retries + 1):
+            self._wait_pause()
+            self.bucket.acquire()
+            started = time.monotonic()
+            try:
+                r = self.session.get(self.base + path, params=params, timeout=self.timeout)
+            except Exception as e:
+                record_request(config, self.base + path, None, 0, time.monotonic() - started, attempt, exc=e)
+                raise
+            if r.status_code != 429 or attempt == self.max_retries:
+                record_request(config, self.base + path, r.status_code, len(r.content), time.monotonic() - started, attempt)
+                return r
+            try:
+                retry_after = float(r.headers.get('Retry-After', 2))
+            except ValueError:
+                retry_after = 2.0
+            with self.lock:
+                self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        return r
+
+_hibp_clients = {}
+_hibp_lock = threading.Lock()
+_hibp_catalogs = {}     # base URL -> {'expires', 'breaches', 'lock'}
+_hibp_catalog_lock = threading.Lock()
+
+def get_hibp_client(config):
+    """Return the scheduler shared by every job that uses the same key, endpoint and rate."""
+    key = (config.get('hibp_api_key'), config.get('hibp_base_url') or HIBP_BASE, float(config.get('hibp_rpm', HIBP_RPM)))
+    with _hibp_lock:
+        if key not in _hibp_clients:
+            _hibp_clients[key] = HIBPScheduler(key[0], rpm=key[2], base=key[1])
+        return _hibp_clients[key]
+
+def hibp_breach_catalog(config):
+    """Full breach catalog ({Name: breach}) of the configured endpoint, fetched once and
+    kept for HIBP_CATALOG_TTL. Concurrent callers wait for a single download of their
+    endpoint's catalog without blocking get_hibp_client or other endpoints.
+    """
+    import requests
+    base = config.get('hibp_base_url') or HIBP_BASE
+    with _hibp_catalog_lock:
+        catalog = _hibp_catalogs.setdefault(base, {'expires': 0, 'breaches': {}, 'lock': threading.Lock()})
+    with catalog['lock']:
+        if catalog['expires'] > time.time():
+            return catalog['breaches']
+        url = base + '/breaches'
+        started = time.monotonic()
+        r = requests.get(url, headers={'User-Agent': 'osint-tool/1.0'}, timeout=30)
+        record_request(config, url, r.status_code, len(r.content), time.monotonic() - started)
+        r.raise_for_status()
+        catalog['breaches'] = {b['Name']: b for b in r.json()}
+        catalog['expires'] = time.time() + HIBP_CATALOG_TTL
+        return catalog['breaches']
+
 def module_hibp(email, config):
     """Query HaveIBeenPwned for breaches and paste sites for an email.
-    Requires config['hibp_api_key'] if HIBP requires key.
+    Requires config['hibp_api_key'] if HIBP requires key. Calls go through the
+    shared HIBPScheduler; with config['hibp_join_catalog'] the truncated breach
+    list is expanded locally from the cached breach catalog.
     """
     result = {'source': 'haveibeenpwned', 'email': email, 'breaches': [], 'pastes': []}
-    api_key = config.get('hibp_api_key')
-    headers = {'User-Agent': 'osint-tool/1.0'}
-    if api_key:
-        headers['hibp-api-key'] = api_key
-    base = 'https://haveibeenpwned.com/api/v3'
+    client = get_hibp_client(config)
+    truncate = config.get('hibp_truncate', True)
+    account = quote(email, safe='@')
     # breaches
     try:
-        r = requests.get(f"{base}/breachedaccount/{email}", headers=headers, timeout=10)
+        r = client.get(f"/breachedaccount/{account}", params={'truncateResponse': str(bool(truncate)).lower()},
+                       config=config)
         if r.status_code == 200:
             result['breaches'] = r.json()
+            if truncate and config.get('hibp_join_catalog'):
+                catalog = hibp_breach_catalog(config)
+                result['breaches'] = [catalog.get(b['Name'], b) for b in result['breaches']]
         elif r.status_code == 404:
             result['breaches'] = []
         else:
@@ -63,147 +301,1372 @@ def module_hibp(email, config):
         result['error'] = str(e)
     # pastes
     try:
-        r = requests.get(f"{base}/pasteaccount/{email}", headers=headers, timeout=10)
+        r = client.get(f"/pasteaccount/{account}", config=config)
         if r.status_code == 200:
             result['pastes'] = r.json()
         elif r.status_code == 404:
             result['pastes'] = []
+        else:
+            result.setdefault('errors', []).append(f"pastes: status {r.status_code}")
     except Exception as e:
         result.setdefault('errors', []).append(str(e))
     return result
 
 # 2) WHOIS
 
+WHOIS_IANA = 'whois.iana.org'
+WHOIS_PER_SERVER = 4        # concurrent connections per WHOIS server; config['whois_per_server']
+WHOIS_RETRIES = 3
+WHOIS_BACKOFF = 0.5         # first backoff (s) after a refused connection or a rate-limit answer
+WHOIS_TLD_TTL = 30 * 24 * 3600
+WHOIS_DEAD_TTL = 300        # referral servers that failed are skipped for this long
+WHOIS_WORKERS = 32          # concurrent lookups in whois_bulk()
+# Registries answer throttled clients with a short text instead of an error code
+WHOIS_RATE_LIMIT_MARKERS = ('limit exceeded', 'rate limit', 'too many', 'try again later', 'quota exceeded')
+_WHOIS_REFERRAL_RE = r'Domain Name: {}\s*.*?Whois Server: (.*?)\s'
+
+def whois_query(server, query, port=43, timeout=10):
+    """Send one raw WHOIS query and return the response text."""
+    with socket.create_connection((server, port), timeout=timeout) as sock:
+        sock.sendall(query.encode('idna') + b'\r\n')
+        chunks = []
+        while True:
+            data = sock.recv(4096)
+            if not data:
+                break
+            chunks.append(data)
+    return b''.join(chunks).decode('utf-8', errors='replace')
+
+def _whois_addr(server, port=43):
+    """'host' or 'host:port' -> (host, port)."""
+    host, sep, p = server.strip().rstrip('.').partition(':')
+    return host.lower(), int(p) if sep else port
+
+def _whois_query_string(host, domain):
+    # same per-registry query syntax as python-whois
+    if host == 'whois.denic.de':
+        return '-T dn,ace -C UTF-8 ' + domain
+    if host == 'whois.dk-hostmaster.dk':
+        return ' --show-handles ' + domain
+    if host.endswith('.jp'):
+        return domain + '/e'
+    return domain
+
+def _whois_domain(domain):
+    """Registrable domain of a hostname or URL, as whois.whois() queries it
+    ('https://www.example.co.uk/x' -> 'example.co.uk').
+    """
+    from whois import extract_domain
+    host = domain.strip().lower()
+    host = (urlparse(host).hostname or host) if '://' in host else host.split('/')[0]
+    host = host.rstrip('.')
+    name = extract_domain(host)
+    if '.' not in name:
+        # suffix missing from the public suffix list: its default rule is one label + TLD
+        name = '.'.join(host.split('.')[-2:])
+    return name
+
+def _parse_whois(domain, text):
+    """Parse a WHOIS response into the python-whois dict."""
+    from whois.parser import WhoisEntry
+    return dict(WhoisEntry.load(domain, text))
+
+_whois_table = []
+
+def _builtin_whois_server(domain):
+    """python-whois's own TLD -> server table, without its per-lookup IANA query."""
+    if not _whois_table:
+        from whois.whois import NICClient
+
+        class _Table(NICClient):
+            def findwhois_iana(self, tld):
+                return None
+        _whois_table.append(_Table())
+    return _whois_table[0].choose_server(domain)
+
+class _WhoisServer:
+    """Connection limit and backoff state of one WHOIS server.
+    The limit starts at per_server, is halved whenever the server throttles us and
+    grows back by one after every per_server clean answers.
+    """
+
+    def __init__(self, per_server):
+        self.max_limit = per_server
+        self.limit = per_server
+        self.active = 0
+        self.clean = 0
+        self.paused_until = 0.0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while True:
+                delay = self.paused_until - time.monotonic()
+                if delay > 0:
+                    self.cond.wait(delay)
+                elif self.active >= self.limit:
+                    self.cond.wait()
+                else:
+                    self.active += 1
+                    return
+
+    def release(self, throttled=False, pause=0.0):
+        with self.cond:
+            self.active -= 1
+            if throttled:
+                self.limit = max(1, self.limit // 2)
+                self.clean = 0
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            elif pause:
+                self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            else:
+                self.clean += 1
+                if self.limit < self.max_limit and self.clean >= self.max_limit:
+                    self.limit += 1
+                    self.clean = 0
+            # waiters on a pause wake up by themselves; only wake as many as there are free slots
+            self.cond.notify(max(0, self.limit - self.active))
+
+class WhoisEngine:
+    """Built-in WHOIS client shared by every lookup with the same settings.
+    The TLD -> registry server map (python-whois's table, then whois.iana.org) and
+    the registrar referral map are cached, every server gets at most per_server
+    open connections, refused connections and rate-limit answers pause that server
+    with exponential backoff. Responses are stitched together and parsed exactly
+    like python-whois does, so whois_raw keeps its shape.
+    """
+
+    def __init__(self, per_server=WHOIS_PER_SERVER, timeout=10, retries=WHOIS_RETRIES,
+                 backoff=WHOIS_BACKOFF, iana=WHOIS_IANA):
+        self.per_server = per_server
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.iana = iana
+        self.servers = {}       # 'host:port' -> _WhoisServer
+        self.tld_servers = {}   # tld -> (server, expires)
+        self.referrals = {}     # registrar server as announced -> usable server or None
+        self.dead = {}          # server -> time until which it is skipped
+        self.stats = {'queries': 0, 'throttled': 0, 'retries': 0, 'tld_lookups': 0}
+        self.lock = threading.Lock()
+        self.tld_lock = threading.Lock()
+
+    def _server(self, key):
+        with self.lock:
+            if key not in self.servers:
+                self.servers[key] = _WhoisServer(self.per_server)
+            return self.servers[key]
+
+    def query(self, server, query, config=None):
+        """One WHOIS query to 'host[:port]', honouring its connection limit and backoff."""
+        host, port = _whois_addr(server)
+        state = self._server(f'{host}:{port}')
+        for attempt in range(self.retries + 1):
+            state.acquire()
+            started = time.monotonic()
+            try:
+                text = whois_query(host, query, port, self.timeout)
+            except OSError as e:
+                record_request(config, f'whois://{host}:{port}/{query}', None, 0,
+                               time.monotonic() - started, attempt, exc=e)
+                last = attempt == self.retries or isinstance(e, socket.gaierror)
+                state.release(pause=0.0 if last else self.backoff * 2 ** attempt)
+                if last:
+                    raise
+                with self.lock:
+                    self.stats['retries'] += 1
+                continue
+            limited = len(text) < 1000 and any(m in text.lower() for m in WHOIS_RATE_LIMIT_MARKERS)
+            state.release(throttled=limited, pause=self.backoff * 2 ** attempt if limited else 0.0)
+            record_request(config, f'whois://{host}:{port}/{query}', 'throttled' if limited else 'ok',
+                           len(text), time.monotonic() - started, attempt)
+            with self.lock:
+                self.stats['queries'] += 1
+                self.stats['throttled'] += limited
+                self.stats['retries'] += limited and attempt < self.retries
+            if not limited:
+                return text
+        raise ConnectionError(f'{host}: {text.strip()}')
+
+    def tld_server(self, tld, config=None):
+        """Registry WHOIS server for a TLD (cached in memory and in the module cache)."""
+        now = time.time()
+        with self.lock:
+            cached = self.tld_servers.get(tld)
+        if cached and cached[1] > now:
+            return cached[0]
+        with self.tld_lock:
+            return self._resolve_tld(tld, now, config)
+
+    def _resolve_tld(self, tld, now, config):
+        # one resolution at a time, so a burst of lookups asks IANA once per TLD
+        with self.lock:
+            cached = self.tld_servers.get(tld)
+        if cached and cached[1] > now:
+            return cached[0]
+        cache = get_cache(config) if config is not None else None
+        server = cache.get('whois_tld', tld, config) if cache else None
+        if server is None:
+            server = _builtin_whois_server('example.' + tld)
+            if server is None:
+                with self.lock:
+                    self.stats['tld_lookups'] += 1
+                text = self.query(self.iana, tld, config)
+                for line in text.splitlines():
+                    key, _, value = line.partition(':')
+                    if key.strip().lower() in ('whois', 'refer') and value.strip():
+                        server = value.strip()
+                        break
+            if not server:
+                raise ValueError(f'no WHOIS server known for .{tld}')
+            if cache:
+                cache.set('whois_tld', tld, config, server, WHOIS_TLD_TTL)
+        with self.lock:
+            self.tld_servers[tld] = (server, now + WHOIS_TLD_TTL)
+        return server
+
+    def _referral(self, domain, text, server):
+        match = re.search(_WHOIS_REFERRAL_RE.format(re.escape(domain)), text, flags=re.IGNORECASE | re.DOTALL)
+        if not match:
+            return None
+        announced = match.group(1)
+        with self.lock:
+            if announced not in self.referrals:
+                # URLs ('https://whois.registrar.tld') cannot be queried on port 43
+                ref = None if '/' in announced else announced.strip().rstrip('.').lower()
+                self.referrals[announced] = ref
+            ref = self.referrals[announced]
+            if ref is None or _whois_addr(ref) == _whois_addr(server) or self.dead.get(ref, 0) > time.time():
+                return None
+        return ref
+
+    def lookup(self, domain, config=None):
+        """Registry (+ registrar referral) response text for a domain, hostname or URL."""
+        config = config or {}
+        domain = _whois_domain(domain).encode('idna').decode('ascii')
+        forced = config.get('whois_server')
+        if forced:
+            server = f"{forced}:{int(config.get('whois_port', 43))}"
+            follow = config.get('whois_follow_referral', False)
+        else:
+            server = self.tld_server(domain.rsplit('.', 1)[-1], config)
+            follow = config.get('whois_follow_referral', True)
+        host = _whois_addr(server)[0]
+        text = self.query(server, _whois_query_string(host, domain), config)
+        if 'with "=xxx"' in text:
+            text = self.query(server, '=' + domain, config)
+        ref = self._referral(domain, text, server) if follow else None
+        if ref:
+            try:
+                text += self.query(ref, _whois_query_string(_whois_addr(ref)[0], domain), config)
+            except OSError:
+                with self.lock:
+                    self.dead[ref] = time.time() + WHOIS_DEAD_TTL
+        return text
+
+    def whois(self, domain, config=None):
+        """Lookup + parse: the same dict python-whois' whois.whois(domain) gives."""
+        domain = _whois_domain(domain)
+        return _parse_whois(domain, self.lookup(domain, config))
+
+_whois_engines = {}
+_whois_engines_lock = threading.Lock()
+
+def get_whois_engine(config):
+    """Return the engine shared by every job with the same WHOIS settings."""
+    key = (int(config.get('whois_per_server', WHOIS_PER_SERVER)), float(config.get('whois_timeout', 10)),
+           int(config.get('whois_retries', WHOIS_RETRIES)), float(config.get('whois_backoff', WHOIS_BACKOFF)),
+           config.get('whois_iana') or WHOIS_IANA)
+    with _whois_engines_lock:
+        if key not in _whois_engines:
+            _whois_engines[key] = WhoisEngine(*key)
+        return _whois_engines[key]
+
+def _python_whois(domain, config):
+    """The previous path: whois.whois(), or one raw query to config['whois_server']."""
+    import whois
+    started = time.monotonic()
+    try:
+        if config.get('whois_server'):
+            from whois.parser import WhoisEntry
+            text = whois_query(config['whois_server'], domain, int(config.get('whois_port', 43)),
+                               float(config.get('whois_timeout', 10)))
+            w = WhoisEntry.load(domain, text)
+        else:
+            w = whois.whois(domain)
+    except Exception as e:
+        record_request(config, f'whois:{domain}', None, 0, time.monotonic() - started, exc=e)
+        raise
+    record_request(config, f'whois:{domain}', 'ok', len(getattr(w, 'text', '') or ''), time.monotonic() - started)
+    return w
+
 def module_whois(domain, config):
+    """WHOIS through the built-in WhoisEngine (config['whois_engine'] = 'python-whois' for
+    the old whois.whois() path). config['whois_server'] / ['whois_port'] force one server.
+    """
     result = {'source': 'whois', 'domain': domain}
     try:
-        w = whois.whois(domain)
+        if config.get('whois_engine') == 'python-whois':
+            w = _python_whois(domain, config)
+        else:
+            w = get_whois_engine(config).whois(domain, config)
         # whois object may be dict-like
         result['whois_raw'] = dict(w)
     except Exception as e:
         result['error'] = str(e)
     return result
 
-# 3) DNS (A, MX, TXT, NS)
+def whois_bulk(domains, config):
+    """module_whois for many domains at once ({domain: result}); the engine's per-server
+    limits keep the concurrency (config['whois_workers']) polite towards each registry.
+    """
+    domains = list(dict.fromkeys(domains))
+    with ThreadPoolExecutor(max_workers=int(config.get('whois_workers', WHOIS_WORKERS)),
+                            thread_name_prefix='osint-whois') as pool:
+        return dict(zip(domains, pool.map(lambda d: module_whois(d, config), domains)))
+
+# 3) DNS (A, MX, TXT, NS, SOA, CNAME)
+
+DNS_RECORD_TYPES = ['A', 'MX', 'TXT', 'NS', 'SOA', 'CNAME']
+
+_resolvers = {}
+_dns_lock = threading.Lock()
+_dns_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix='osint-dns')
+
+def get_resolver(config):
+    """Return the shared resolver for config['dns_nameservers'] / config['dns_port'].
+    Resolvers are reused across calls and keep an LRU cache that honours record
+    TTLs, negative answers (NXDOMAIN / no data) included.
+    """
+    import dns.resolver
+    nameservers = tuple(config.get('dns_nameservers') or ())
+    port = int(config.get('dns_port', 53))
+    with _dns_lock:
+        resolver = _resolvers.get((nameservers, port))
+        if resolver is None:
+            resolver = dns.resolver.Resolver(configure=not nameservers)
+            if nameservers:
+                resolver.nameservers = list(nameservers)
+            resolver.port = port
+            resolver.cache = dns.resolver.LRUCache(int(config.get('dns_cache_size', 100000)))
+            _resolvers[(nameservers, port)] = resolver
+        return resolver
+
+def _dns_query(resolver, name, rtype, lifetime, bucket=None, config=None):
+    """Return the answer values, [] for NXDOMAIN / no data; any other failure is re-raised."""
+    if bucket:
+        bucket.acquire()
+    started = time.monotonic()
+    try:
+        answers = resolver.resolve(name, rtype, lifetime=lifetime)
+        record_request(config, f'dns:{name}/{rtype}', 'NOERROR', 0, time.monotonic() - started)
+        return [str(r).rstrip('\n') for r in answers]
+    except Exception as e:
+        # NXDOMAIN / NoAnswer are answers, not failures
+        negative = type(e).__name__ in ('NXDOMAIN', 'NoAnswer')
+        record_request(config, f'dns:{name}/{rtype}', type(e).__name__ if negative else None, 0,
+                       time.monotonic() - started, exc=None if negative else e)
+        if not negative:
+            raise
+        return []
+
+def _subdomain_candidates(domain, config):
+    labels = config.get('dns_subdomains') or []
+    path = config.get('dns_subdomains_file')
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            labels = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    for label in labels:
+        yield label if label.endswith('.' + domain) else f'{label}.{domain}'
+
+def dns_bulk_resolve(hostnames, config, rtype='A', failed=None):
+    """Resolve many hostnames concurrently and return {hostname: [values]} for those that exist.
+    Concurrency is config['dns_workers'] (default 64) and config['dns_qps'] caps the query rate.
+    Hostnames whose query failed (timeout, no nameserver...) are appended to `failed` if given.
+    """
+    resolver = get_resolver(config)
+    lifetime = float(config.get('dns_lifetime', 5))
+    workers = int(config.get('dns_workers', 64))
+    bucket = TokenBucket(config['dns_qps']) if config.get('dns_qps') else None
+    found = {}
+
+    def collect(f, name):
+        if f.exception() is not None:
+            if failed is not None:
+                failed.append(name)
+        elif f.result():
+            found[name] = f.result()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='osint-dns-bulk') as pool:
+        inflight = {}
+        for name in hostnames:
+            if len(inflight) >= workers * 4:
+                done, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+                for f in done:
+                    collect(f, inflight.pop(f))
+            inflight[pool.submit(_dns_query, resolver, name, rtype, lifetime, bucket, config)] = name
+        for f, name in inflight.items():
+            collect(f, name)
+    return found
 
 def module_dns(domain, config):
+    """Resolve the usual record types in parallel on the shared caching resolver.
+    With config['dns_subdomains'] (labels) or config['dns_subdomains_file'] (wordlist)
+    it also resolves <label>.<domain> in bulk and lists the ones that exist.
+    Only NXDOMAIN / no data count as empty answers: failed queries set 'error', so an
+    unreachable resolver is neither cached nor taken as "no records".
+    """
     result = {'source': 'dns', 'domain': domain, 'records': {}}
-    resolver = dns.resolver.Resolver()
-    types = ['A', 'MX', 'TXT', 'NS', 'SOA', 'CNAME']
-    for t in types:
+    resolver = get_resolver(config)
+    lifetime = float(config.get('dns_lifetime', 5))
+    futures = {t: _dns_pool.submit(_dns_query, resolver, domain, t, lifetime, None, config) for t in DNS_RECORD_TYPES}
+    errors = []
+    for t, f in futures.items():
         try:
-            answers = resolver.resolve(domain, t, lifetime=5)
-            vals = []
-            for r in answers:
-                vals.append(str(r).rstrip('\n'))
-            result['records'][t] = vals
+            result['records'][t] = f.result()
         except Exception as e:
             result['records'][t] = []
+            errors.append(f'{t}: {type(e).__name__}: {e}')
+    if config.get('dns_subdomains') or config.get('dns_subdomains_file'):
+        failed = []
+        result['subdomains'] = dns_bulk_resolve(_subdomain_candidates(domain, config), config, failed=failed)
+        if failed:
+            errors.append(f'subdomains: {len(failed)} queries failed (e.g. {failed[0]})')
+    if errors:
+        result['errors'] = errors
+        result['error'] = 'DNS query failed: ' + errors[0]
     return result
 
 # 4) Domain metadata (title, meta tags, server header, favicon)
 
+META_MAX_BYTES = 256 * 1024     # cap for the page download; override with config['meta_max_bytes']
+FAVICON_MAX_BYTES = 512 * 1024
+
+_meta_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix='osint-meta')
+
+def fetch_bounded(url, max_bytes, timeout=10, stop_at=None, headers=None, config=None):
+    """Streaming GET that reads at most max_bytes (and stops right after stop_at if given).
+    Returns (response, body_bytes) or (None, None) on any error / non 2xx status.
+    """
+    import requests
+    started = time.monotonic()
+    r = None
+    try:
+        r = requests.get(url, timeout=timeout, headers=headers or {'User-Agent': 'osint-tool/1.0'}, stream=True)
+        r.raise_for_status()
+        body = bytearray()
+        for chunk in r.iter_content(16384):
+            body += chunk
+            if stop_at:
+                idx = body.lower().find(stop_at, max(0, len(body) - len(chunk) - len(stop_at)))
+                if idx != -1:
+                    del body[idx + len(stop_at):]
+                    break
+            if len(body) >= max_bytes:
+                del body[max_bytes:]
+                break
+        r.close()
+        record_request(config, url, r.status_code, len(body), time.monotonic() - started)
+        return r, bytes(body)
+    except Exception as e:
+        record_request(config, url, r.status_code if r is not None else None, 0, time.monotonic() - started, exc=e)
+        return None, None
+
+def favicon_hashes(url, config):
+    """Download a favicon and return {'url', 'mmh3', 'md5'} (mmh3 only if the package is installed)."""
+    mmh3 = optional_import('mmh3')  # favicon hash in the format Shodan uses for pivoting
+    r, content = fetch_bounded(url, FAVICON_MAX_BYTES, timeout=float(config.get('meta_timeout', 10)), config=config)
+    if not content:
+        return {'url': url, 'mmh3': None, 'md5': None}
+    return {'url': url,
+            'mmh3': mmh3.hash(base64.encodebytes(content)) if mmh3 else None,
+            'md5': hashlib.md5(content).hexdigest()}
+
 def module_meta(domain, config):
-    url = domain
-    if not url.startswith('http'):
-        url = 'http://' + domain
+    """Fetch the page head (HTTPS first, then HTTP) and extract title, meta tags, headers and favicon.
+    Only the bytes up to </head> (or config['meta_max_bytes']) are downloaded, and the
+    default /favicon.ico is fetched and hashed while the head is being parsed.
+    """
+    from bs4 import BeautifulSoup, SoupStrainer
+    urls = [domain] if domain.startswith('http') else ['https://' + domain, 'http://' + domain]
     result = {'source': 'domain_meta', 'domain': domain, 'http': {}}
-    r = safe_get(url, headers={'User-Agent':'osint-tool/1.0'})
-    if not r:
+    max_bytes = int(config.get('meta_max_bytes', META_MAX_BYTES))
+    timeout = float(config.get('meta_timeout', 10))
+    r = body = None
+    for url in urls:
+        r, body = fetch_bounded(url, max_bytes, timeout=timeout, stop_at=b'</head>', config=config)
+        if r is not None:
+            break
+    if r is None:
         result['error'] = 'no http response'
         return result
+    result['http']['url'] = r.url
     result['http']['status_code'] = r.status_code
     result['http']['headers'] = dict(r.headers)
+    default_icon = urljoin(r.url, '/favicon.ico')
+    icon_future = _meta_pool.submit(favicon_hashes, default_icon, config)
+    soup = None
     try:
-        soup = BeautifulSoup(r.text, 'html.parser')
+        html = body.decode(r.encoding or 'utf-8', errors='replace')
+        parser = 'lxml' if optional_import('lxml') else 'html.parser'
+        soup = BeautifulSoup(html, parser, parse_only=SoupStrainer(['title', 'meta', 'link']))
         title = soup.title.string.strip() if soup.title and soup.title.string else ''
         metas = {m.get('name') or m.get('property') or f"meta_{i}": m.get('content') for i,m in enumerate(soup.find_all('meta'))}
         result['http']['title'] = title
         result['http']['meta'] = metas
+        # hosts referenced from <link href> (CDNs, sister sites...), used for pivoting
+        own = urlparse(r.url).hostname
+        hosts = {urlparse(urljoin(r.url, l.get('href'))).hostname for l in soup.find_all('link', href=True)}
+        result['http']['link_hosts'] = sorted(h for h in hosts if h and h != own)
     except Exception as e:
         result.setdefault('errors', []).append(str(e))
-    # try favicon
-    favicon = None
+    # favicon: declared <link rel=icon> wins over the default /favicon.ico
+    favicon = default_icon
     try:
-        ico = soup.find('link', rel=lambda x: x and 'icon' in x.lower())
+        ico = soup.find('link', rel=lambda x: x and 'icon' in ' '.join(x if isinstance(x, list) else [x]).lower())
         if ico and ico.get('href'):
-            href = ico.get('href')
-            if href.startswith('http'):
-                favicon = href
-            else:
-                favicon = url.rstrip('/') + '/' + href.lstrip('/')
+            favicon = urljoin(r.url, ico.get('href'))
     except Exception:
         pass
-    result['http']['favicon'] = favicon
+    if favicon == default_icon:
+        icon = icon_future.result()
+    else:
+        icon_future.cancel()
+        icon = favicon_hashes(favicon, config)
+    result['http']['favicon'] = favicon if favicon != default_icon or icon['md5'] else None
+    result['http']['favicon_hash'] = icon['mmh3']
+    result['http']['favicon_md5'] = icon['md5']
     return result
 
 # 5) Username footprint (pluggable checks)
 
+# Service catalog: JSON list of {"name", "url" (with {username}), "method" (HEAD|GET)}
+USERNAME_SERVICES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'username_services.json')
+
+DEFAULT_USERNAME_SERVICES = [
+    {'name': 'GitHub', 'url': 'https://github.com/{username}'},
+    {'name': 'Reddit', 'url': 'https://www.reddit.com/user/{username}'},
+    {'name': 'Keybase', 'url': 'https://keybase.io/{username}'},
+    {'name': 'Twitter', 'url': 'https://twitter.com/{username}'},
+    {'name': 'Instagram', 'url': 'https://www.instagram.com/{username}/'},
+]
+
+_username_catalogs = {}
+
+def load_username_services(path=None):
+    """Load (once per path) the username service catalog, falling back to the built-in list."""
+    path = path or USERNAME_SERVICES_FILE
+    if path not in _username_catalogs:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                _username_catalogs[path] = json.load(f)
+        except (OSError, ValueError):
+            _username_catalogs[path] = list(DEFAULT_USERNAME_SERVICES)
+    return _username_catalogs[path]
+
+class UsernameProber:
+    """Concurrent username prober with pooled keep-alive connections.
+    Concurrency is capped globally (max_workers) and per host (per_host), so the
+    same instance can be shared by every job without hammering a single service.
+    """
+    found_statuses = (200, 206, 301, 302)
+    max_drain = 64 * 1024
+
+    def __init__(self, max_workers=32, per_host=4, timeout=7, pool_hosts=256):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.timeout = timeout
+        self.per_host = per_host
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'osint-tool/1.0'
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=max(per_host, 1))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='osint-username')
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            slot = self._hosts.get(host)
+            if slot is None:
+                slot = self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def _request(self, method, url):
+        headers = {'Range': 'bytes=0-0'} if method == 'GET' else {}
+        r = self.session.request(method, url, headers=headers, timeout=self.timeout,
+                                 allow_redirects=True, stream=True)
+        # drain small bodies so the connection goes back to the pool
+        read = 0
+        for chunk in r.iter_content(8192):
+            read += len(chunk)
+            if read > self.max_drain:
+                break
+        r.close()
+        return r, read
+
+    def _timed_request(self, method, url, config):
+        started = time.monotonic()
+        try:
+            r, read = self._request(method, url)
+        except Exception as e:
+            record_request(config, url, None, 0, time.monotonic() - started, exc=e)
+            raise
+        record_request(config, url, r.status_code, read, time.monotonic() - started)
+        return r
+
+    def probe(self, service, username, config=None):
+        """Return {'service', 'url', 'status'} for a hit, {'service', 'error'} on failure, else None."""
+        url = service['url'].format(username=username)
+        method = (service.get('method') or 'HEAD').upper()
+        with self._host_slot(url):
+            try:
+                r = self._timed_request(method, url, config)
+                if method == 'HEAD' and r.status_code in (405, 501):
+                    r = self._timed_request('GET', url, config)
+            except Exception as e:
+                return {'service': service['name'], 'error': f'{type(e).__name__}: {e}'}
+        if r.status_code in self.found_statuses:
+            return {'service': service['name'], 'url': url, 'status': r.status_code}
+        return None
+
+    def check(self, username, services, config=None):
+        """Probe every service; returns (hits, failures)."""
+        futures = [self.pool.submit(self.probe, s, username, config) for s in services]
+        outcomes = [o for o in (f.result() for f in futures) if o]
+        return [o for o in outcomes if 'error' not in o], [o for o in outcomes if 'error' in o]
+
+_username_probers = {}
+_username_probers_lock = threading.Lock()
+
+def get_username_prober(config):
+    """Return the shared prober for the concurrency settings in config."""
+    key = (int(config.get('username_workers', 32)), int(config.get('username_per_host', 4)),
+           float(config.get('username_timeout', 7)))
+    with _username_probers_lock:
+        if key not in _username_probers:
+            _username_probers[key] = UsernameProber(max_workers=key[0], per_host=key[1], timeout=key[2])
+        return _username_probers[key]
+
+def _username_services(config):
+    services = config.get('username_services')
+    if services is None:
+        return load_username_services(config.get('username_services_file'))
+    # legacy form: list of (name, url) pairs with the URL already built
+    return [s if isinstance(s, dict) else {'name': s[0], 'url': s[1].replace('{', '{{').replace('}', '}}')}
+            for s in services]
+
 def module_username(username, config):
-    """Check a list of public services for username presence.
-    This module uses simple HTTP checks and public endpoints where allowed.
-    """
-    services = config.get('username_services', [
-        ('GitHub', f'https://github.com/{username}'),
-        ('Reddit', f'https://www.reddit.com/user/{username}'),
-        ('Keybase', f'https://keybase.io/{username}'),
-        ('Twitter', f'https://twitter.com/{username}'),
-        ('Instagram', f'https://www.instagram.com/{username}/'),
-    ])
+    """Check a catalog of public services for username presence.
+    Services come from username_services.json (or config['username_services']) and are
+    probed concurrently with HEAD or single-byte ranged GET requests over pooled connections.
+    """
     result = {'source': 'username', 'username': username, 'found_on': []}
-    headers = {'User-Agent': 'osint-tool/1.0'}
-    for name, url in services:
+    services = _username_services(config)
+    result['found_on'], failures = get_username_prober(config).check(username, services, config)
+    if failures:
+        result['errors'] = [f"{f['service']}: {f['error']}" for f in failures]
+    return result
+
+# 6) nmap XML ingestion (-sV scans) with CVE enrichment
+
+NMAP_OPEN_STATES = ('open',)    # port states kept; override with config['nmap_states']
+CVE_TTL = 24 * 3600             # cache lifetime of a CVE lookup; override with config['cve_ttl']
+CVE_WORKERS = 16
+
+def iter_nmap_hosts(path, states=NMAP_OPEN_STATES):
+    """Stream the hosts of an nmap XML file as dicts, one <host> element at a time.
+    Parsed elements are cleared as soon as they are read, so memory stays flat for
+    scans of any size. Hosts without a port in `states` are skipped.
+    """
+    import xml.etree.ElementTree as ET
+    context = ET.iterparse(path, events=('start', 'end'))
+    root = None
+    for event, elem in context:
+        if root is None:
+            root = elem
+        if event != 'end' or elem.tag != 'host':
+            continue
+        host = {'ip': None, 'hostnames': [], 'status': None, 'ports': []}
+        for addr in elem.findall('address'):
+            if addr.get('addrtype') in ('ipv4', 'ipv6') and not host['ip']:
+                host['ip'] = addr.get('addr')
+            elif addr.get('addrtype') == 'mac':
+                host['mac'] = addr.get('addr')
+        status = elem.find('status')
+        host['status'] = status.get('state') if status is not None else None
+        host['hostnames'] = [h.get('name') for h in elem.iter('hostname') if h.get('name')]
+        for port in elem.iter('port'):
+            state = port.find('state')
+            state = state.get('state') if state is not None else None
+            if state not in states:
+                continue
+            service = port.find('service')
+            svc = service.attrib if service is not None else {}
+            host['ports'].append({
+                'port': int(port.get('portid')), 'protocol': port.get('protocol'), 'state': state,
+                'service': svc.get('name'), 'product': svc.get('product'), 'version': svc.get('version'),
+                'extrainfo': svc.get('extrainfo'),
+                'cpe': [c.text for c in service.findall('cpe') if c.text] if service is not None else [],
+            })
+        root.clear()    # drop the finished <host> (and anything before it)
+        if host['ports']:
+            yield host
+
+class CVESource:
+    """Pluggable CVE lookup for nmap findings.
+    key(host, port) -> dedup/cache key for the lookup (None to skip the port),
+    lookup(key, config) -> JSON-able answer, cves(answer, host, port) -> CVE ids.
+    """
+    name = None
+
+    def __init__(self, config):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = 'osint-tool/1.0'
+        # one pooled connection per lookup worker
+        adapter = HTTPAdapter(pool_maxsize=int(config.get('cve_workers', CVE_WORKERS)))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.timeout = float(config.get('cve_timeout', 15))
+
+    def _get_json(self, url, config, params=None):
+        started = time.monotonic()
         try:
-            r = requests.get(url, headers=headers, timeout=7)
-            if r.status_code == 200:
-                result['found_on'].append({'service': name, 'url': url, 'status': 200})
-            elif r.status_code == 302 or r.status_code == 301:
-                result['found_on'].append({'service': name, 'url': url, 'status': r.status_code})
-        except Exception:
-            pass
+            r = self.session.get(url, params=params, timeout=self.timeout)
+        except Exception as e:
+            record_request(config, url, None, 0, time.monotonic() - started, exc=e)
+            raise
+        record_request(config, url, r.status_code, len(r.content), time.monotonic() - started)
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        return r.json()
+
+class ShodanCVESource(CVESource):
+    """Shodan host API (what nmap_shodan_report_full.sh used): one lookup per IP, vulns per port."""
+    name = 'shodan'
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.api_key = config.get('shodan_api_key')
+        self.base = (config.get('shodan_base_url') or 'https://api.shodan.io').rstrip('/')
+        if not self.api_key:
+            raise ValueError('shodan_api_key missing')
+
+    def key(self, host, port):
+        return host['ip']
+
+    def lookup(self, key, config):
+        data = self._get_json(f'{self.base}/shodan/host/{key}', config, params={'key': self.api_key}) or {}
+        ports = {}
+        for banner in data.get('data') or []:
+            if banner.get('vulns'):
+                ports.setdefault(str(banner.get('port')), set()).update(banner['vulns'])
+        return {'ports': {p: sorted(v) for p, v in ports.items()}, 'vulns': sorted(data.get('vulns') or [])}
+
+    def cves(self, answer, host, port):
+        return answer['ports'].get(str(port['port']), [])
+
+class CirclCVESource(CVESource):
+    """CVE Search (cve.circl.lu) by the service CPE that nmap -sV reports; one lookup per product version."""
+    name = 'circl'
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.base = (config.get('circl_base_url') or 'https://cve.circl.lu/api').rstrip('/')
+
+    def key(self, host, port):
+        # only CPEs with a version (cpe:/a:vendor:product:version) identify vulnerable releases
+        versioned = [c for c in port['cpe'] if len(c.split(':')) >= 5]
+        return versioned[0] if versioned else None
+
+    def lookup(self, key, config):
+        data = self._get_json(f'{self.base}/cvefor/{quote(key, safe=":/")}', config) or []
+        items = data.get('results', data) if isinstance(data, dict) else data
+        return {'cves': sorted({c.get('id') for c in items if isinstance(c, dict) and c.get('id')})}
+
+    def cves(self, answer, host, port):
+        return answer['cves']
+
+CVE_SOURCES = {'shodan': ShodanCVESource, 'circl': CirclCVESource}
+
+def register_cve_source(name, factory):
+    """Add a CVE source usable as config['cve_source'] (factory(config) -> CVESource)."""
+    CVE_SOURCES[name] = factory
+
+def enrich_cves(hosts, config):
+    """Attach 'cves' to every port of hosts using config['cve_source'].
+    Lookups are deduplicated by the source key (same IP / same CPE), run concurrently
+    (config['cve_workers']), optionally rate limited (config['cve_qps'], e.g. 1 for the
+    Shodan API) and go through the module cache. Returns lookup stats.
+    """
+    source = CVE_SOURCES[config['cve_source']](config)
+    cache = get_cache(config)
+    cache_module = f'cve_{source.name}'
+    ttl = float(config.get('cve_ttl', CVE_TTL))
+    stats = {'lookups': 0, 'cached': 0, 'deduplicated': 0, 'errors': 0}
+    answers = {}
+    bucket = TokenBucket(float(config['cve_qps'])) if config.get('cve_qps') else None
+
+    def lookup(key):
+        cached = cache.get(cache_module, key, config) if cache else None
+        if cached is not None:
+            return cached, True
+        if bucket:
+            bucket.acquire()
+        answer = source.lookup(key, config)
+        if cache:
+            cache.set(cache_module, key, config, answer, ttl)
+        return answer, False
+
+    with ThreadPoolExecutor(max_workers=int(config.get('cve_workers', CVE_WORKERS)),
+                            thread_name_prefix='osint-cve') as pool:
+        wanted = []
+        for host in hosts:
+            for port in host['ports']:
+                key = source.key(host, port)
+                if key is None:
+                    continue
+                if key in answers:
+                    stats['deduplicated'] += 1
+                else:
+                    stats['lookups'] += 1
+                    answers[key] = pool.submit(lookup, key)
+                wanted.append((host, port, key))
+        for host, port, key in wanted:
+            try:
+                port['cves'] = source.cves(answers[key].result()[0], host, port)
+            except Exception as e:
+                port['cve_error'] = strip_query(str(e))
+    for f in answers.values():
+        if f.exception() is not None:
+            stats['errors'] += 1
+        elif f.result()[1]:
+            stats['cached'] += 1
+    return stats
+
+def module_nmap(path, config):
+    """Ingest an nmap XML file (e.g. -p- -sV output) into host/port/service findings.
+    The file is parsed in streaming; with config['cve_source'] ('shodan' with
+    config['shodan_api_key'], 'circl', or a registered source) open services are
+    enriched with CVEs.
+    """
+    result = {'source': 'nmap', 'nmap_xml': path, 'hosts': []}
+    try:
+        states = tuple(config.get('nmap_states') or NMAP_OPEN_STATES)
+        result['hosts'] = list(iter_nmap_hosts(path, states))
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+        return result
+    if config.get('cve_source'):
+        try:
+            result['cve_lookups'] = enrich_cves(result['hosts'], config)
+        except Exception as e:
+            result.setdefault('errors', []).append(f'cve: {strip_query(str(e))}')
+    cves = {c for h in result['hosts'] for p in h['ports'] for c in p.get('cves') or []}
+    result['summary'] = {'hosts': len(result['hosts']),
+                         'open_ports': sum(len(h['ports']) for h in result['hosts']),
+                         'cves': sorted(cves)}
+    return result
+
+# ------------------------- Cache -------------------------------------
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'osint_cache.sqlite3')
+CACHE_MAX_ENTRIES = 20000
+
+# Time-to-live (seconds) per cached module; override with config['cache_ttl']
+CACHE_TTL = {
+    'haveibeenpwned': 24 * 3600,
+    'whois': 7 * 24 * 3600,
+    'dns': 3600,
+    'domain_meta': 6 * 3600,
+}
+
+# Config keys that change a module's answer and therefore belong in its cache key
+CACHE_CONFIG_KEYS = {
+    'haveibeenpwned': ('hibp_api_key', 'hibp_base_url', 'hibp_truncate', 'hibp_join_catalog'),
+    'whois': ('whois_server', 'whois_port', 'whois_engine', 'whois_follow_referral'),
+    'whois_tld': ('whois_iana',),
+    'dns': ('dns_nameservers', 'dns_port', 'dns_subdomains', 'dns_subdomains_file'),
+    'domain_meta': ('meta_max_bytes',),
+}
+
+# Target types compared case-insensitively; usernames, paths and the like keep their case
+CASE_INSENSITIVE_TARGETS = ('domain', 'email')
+
+def normalize_target(input_type, value):
+    """Canonical form of a target for cache and coalescing keys."""
+    value = str(value).strip()
+    return value.lower() if input_type in CASE_INSENSITIVE_TARGETS else value
+
+class ModuleCache:
+    """On-disk (SQLite) TTL cache for module results, shared by every module.
+    Entries are keyed by (module, target, relevant config); the least recently
+    used ones are evicted once the table grows past max_entries.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = {}
+        self.misses = {}
+        self._sets = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, module TEXT, '
+                              'value TEXT, expires REAL, accessed REAL)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+
+    @staticmethod
+    def make_key(module, target, config):
+        relevant = {k: config.get(k) for k in CACHE_CONFIG_KEYS.get(module, ())}
+        spec = MODULES.get(module)
+        target = normalize_target(spec.input_type if spec else None, target)
+        raw = json.dumps([module, target, relevant], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, module, target, config):
+        key = self.make_key(module, target, config)
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute('SELECT value, expires FROM cache WHERE key = ?', (key,)).fetchone()
+            if row and row[1] > now:
+                self.conn.execute('UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+                self.hits[module] = self.hits.get(module, 0) + 1
+                METRICS.inc('osint_cache_requests_total', {'module': module, 'result': 'hit'})
+                return json.loads(row[0])
+            self.misses[module] = self.misses.get(module, 0) + 1
+        METRICS.inc('osint_cache_requests_total', {'module': module, 'result': 'miss'})
+        return None
+
+    def set(self, module, target, config, value, ttl):
+        key = self.make_key(module, target, config)
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+                              (key, module, json.dumps(value, default=str), now + ttl, now))
+            self._sets += 1
+            if self._sets % 100 == 1:
+                self._evict()
+
+    def _evict(self):
+        now = time.time()
+        self.conn.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        excess = self.conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0] - self.max_entries
+        if excess > 0:
+            self.conn.execute('DELETE FROM cache WHERE key IN '
+                              '(SELECT key FROM cache ORDER BY accessed LIMIT ?)', (excess,))
+
+    def stats(self):
+        with self._lock:
+            entries = self.conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+            return {'hits': dict(self.hits), 'misses': dict(self.misses), 'entries': entries}
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_cache(config):
+    """Return the shared ModuleCache for config['cache_path'], or None if config['cache'] is False."""
+    if config.get('cache') is False:
+        return None
+    path = config.get('cache_path') or CACHE_PATH
+    with _caches_lock:
+        if path not in _caches:
+            _caches[path] = ModuleCache(path, max_entries=int(config.get('cache_max_entries', CACHE_MAX_ENTRIES)))
+        return _caches[path]
+
+def _force_refresh(source, config):
+    force = config.get('force_refresh')
+    if isinstance(force, (list, tuple, set)):
+        return source in force
+    return bool(force)
+
+def run_cached(source, func, target, config):
+    """Run func(target, config) through the module cache when source is cacheable.
+    Results with 'error' or partial failures in 'errors' are returned but not cached.
+    """
+    ttl = dict(CACHE_TTL, **(config.get('cache_ttl') or {})).get(source)
+    cache = get_cache(config) if ttl else None
+    if cache is None:
+        return func(target, config)
+    if not _force_refresh(source, config):
+        cached = cache.get(source, target, config)
+        if cached is not None:
+            cached['cached'] = True
+            return cached
+    result = func(target, config)
+    if not result.get('error') and not result.get('errors'):
+        cache.set(source, target, config, result, ttl)
     return result
 
+# ------------------------- Module registry ---------------------------
+
+# Deadline (seconds) for the whole job; override with config['job_timeout']
+JOB_TIMEOUT = 60
+
+# Third-party packages can add modules through this entry point group. The entry
+# point must resolve to a ModuleSpec (or a dict with the same fields), declared in a
+# lightweight module; its `loader` is only imported when the module first runs.
+ENTRY_POINT_GROUP = 'osint_tool.modules'
+
+class ModuleSpec:
+    """Declaration of an OSINT source.
+    name: report 'source'; input_type: target key it consumes (email, domain, username...);
+    loader: the run(target, config) callable or a 'package.module:function' string;
+    requires: importable names it depends on; timeout: default deadline in seconds.
+    """
+
+    def __init__(self, name, input_type, loader, requires=(), timeout=30):
+        self.name = name
+        self.input_type = input_type
+        self.loader = loader
+        self.requires = tuple(requires)
+        self.timeout = timeout
+        self._func = None
+        self._missing = None
+
+    @property
+    def func(self):
+        if self._func is None:
+            if callable(self.loader):
+                self._func = self.loader
+            else:
+                module, _, attr = self.loader.partition(':')
+                self._func = getattr(importlib.import_module(module), attr)
+        return self._func
+
+    def missing(self):
+        """Names in requires that are not installed (checked without importing them)."""
+        if self._missing is None:
+            import importlib.util
+            self._missing = [r for r in self.requires if importlib.util.find_spec(r.split('.')[0]) is None]
+        return self._missing
+
+MODULES = {}
+_entry_points_loaded = False
+
+def register_module(name, input_type, loader, requires=(), timeout=30):
+    """Register (or replace) a module; report order follows registration order."""
+    MODULES[name] = ModuleSpec(name, input_type, loader, requires, timeout)
+    return MODULES[name]
+
+def load_entry_point_modules():
+    """Register the modules that installed packages expose under ENTRY_POINT_GROUP (once)."""
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    from importlib.metadata import entry_points
+    eps = entry_points()
+    eps = eps.select(group=ENTRY_POINT_GROUP) if hasattr(eps, 'select') else eps.get(ENTRY_POINT_GROUP, [])
+    for ep in eps:
+        try:
+            spec = ep.load()
+            if isinstance(spec, dict):
+                spec = ModuleSpec(**spec)
+            MODULES[spec.name] = spec
+        except Exception as e:
+            print(f'[-] No se pudo cargar el módulo {ep.name}: {e}', file=sys.stderr)
+
+register_module('haveibeenpwned', 'email', module_hibp, requires=('requests',), timeout=25)
+register_module('whois', 'domain', module_whois, requires=('whois',), timeout=20)
+register_module('dns', 'domain', module_dns, requires=('dns.resolver',), timeout=35)
+register_module('domain_meta', 'domain', module_meta, requires=('requests', 'bs4'), timeout=15)
+register_module('username', 'username', module_username, requires=('requests',), timeout=45)
+register_module('nmap', 'nmap_xml', module_nmap, timeout=120)
+
+# Targets that are paths on this machine: accepted from the CLI / batch input, never over HTTP
+LOCAL_TARGET_KEYS = ('nmap_xml',)
+# Config keys naming files on this machine (read, or created like the SQLite databases):
+# honoured from the CLI / batch config, never over HTTP. Profile dumps are written under
+# profile_dir, so profiling is local-only as well
+LOCAL_CONFIG_KEYS = ('dns_subdomains_file', 'username_services_file', 'cache_path', 'history_path',
+                     'archive_path', 'profile', 'profile_dir')
+
+def target_keys(remote=False):
+    """Target keys understood by the registered modules (email, domain, username, ...).
+    remote=True leaves out LOCAL_TARGET_KEYS, for input coming from the web API.
+    """
+    load_entry_point_modules()
+    keys = []
+    for spec in MODULES.values():
+        if spec.input_type not in keys and not (remote and spec.input_type in LOCAL_TARGET_KEYS):
+            keys.append(spec.input_type)
+    return keys
+
+def remote_config(config):
+    """Config of a web API request without LOCAL_CONFIG_KEYS or internal ('_'-prefixed) keys."""
+    if not isinstance(config, dict):
+        return {}
+    return {k: v for k, v in config.items() if k not in LOCAL_CONFIG_KEYS and not str(k).startswith('_')}
+
+# ------------------------- Request coalescing ------------------------
+
+# Config keys that only change how a run is observed, not its results
+COALESCE_IGNORE_KEYS = ('profile', 'profile_dir', 'coalesce')
+# A module call joined by another report is still bounded by the joiner's own deadline
+# (run_modules stops waiting for it), so deadlines only matter for whole reports
+MODULE_COALESCE_IGNORE_KEYS = ('modules', 'job_timeout', 'module_timeouts')
+
+def coalesce_key(kind, target, config, ignore=(), input_type=None):
+    """Key of a computation: kind + normalized target(s) + every result-relevant config key.
+    target is a targets dict (report) or a single value of type input_type (module call).
+    """
+    if isinstance(target, dict):
+        target = {k: normalize_target(k, v) for k, v in target.items()}
+    else:
+        target = normalize_target(input_type, target)
+    relevant = {k: v for k, v in config.items()
+                if not k.startswith('_') and k not in COALESCE_IGNORE_KEYS and k not in ignore}
+    raw = json.dumps([kind, target, relevant], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Concurrent calls with the same key share one in-flight computation.
+    The first caller runs func(); the others wait for it and get a deep copy of its
+    result (or its exception). Nothing is kept once the call returns; caching
+    finished results is the module cache's job.
+    """
+
+    def __init__(self, level):
+        self.level = level
+        self.flights = {}
+        self.stats = {'executed': 0, 'coalesced': 0}
+        self.lock = threading.Lock()
+
+    def do(self, key, func):
+        """Return (result, shared); shared is True when the result came from another caller."""
+        import copy
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+                self.stats['executed'] += 1
+            else:
+                flight.waiters += 1
+                self.stats['coalesced'] += 1
+        if not leader:
+            METRICS.inc('osint_coalesced_total', {'level': self.level})
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result), True
+        try:
+            result = func()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+                waiters = flight.waiters
+            if waiters and flight.error is None:
+                # private snapshot: the leader's caller is free to mutate its own result
+                flight.result = copy.deepcopy(result)
+            flight.done.set()
+        return result, False
+
+MODULE_FLIGHTS = SingleFlight('module')
+REPORT_FLIGHTS = SingleFlight('report')
+
+# ------------------------- Execution engine --------------------------
+
+def plan_modules(targets, only=None):
+    """Return the ModuleSpecs that apply to targets, in report order.
+    only (config['modules']) restricts the run to those module names.
+    """
+    load_entry_point_modules()
+    return [spec for spec in MODULES.values()
+            if spec.input_type in targets and (not only or spec.name in only)]
+
+def _module_status(source, key, target, status, error=None):
+    result = {'source': source, key: target, 'status': status}
+    if error:
+        result['error'] = error
+    return result
+
+def _run_spec(spec, target, config, trace):
+    """Run one module; identical concurrent calls (same module, target and config) are
+    coalesced into one, and the callers that joined get a copy marked 'coalesced'.
+    """
+    missing = spec.missing()
+    if missing:
+        return {'source': spec.name, spec.input_type: target, 'error': 'missing dependency: ' + ', '.join(missing)}
+    config = dict(config, _trace=trace)
+    if config.get('coalesce') is False:
+        return _run_spec_once(spec, target, config)
+    key = coalesce_key(spec.name, target, config, ignore=MODULE_COALESCE_IGNORE_KEYS, input_type=spec.input_type)
+    result, shared = MODULE_FLIGHTS.do(key, lambda: _run_spec_once(spec, target, config))
+    if shared:
+        result['coalesced'] = True
+    return result
+
+def _run_spec_once(spec, target, config):
+    if config.get('_profiles') is None:
+        return run_cached(spec.name, spec.func, target, config)
+    import cProfile
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # another profiler is already active in this interpreter (Python 3.12+ allows one)
+        return run_cached(spec.name, spec.func, target, config)
+    try:
+        return run_cached(spec.name, spec.func, target, config)
+    finally:
+        profile.disable()
+        config['_profiles'].append(profile)
+
+def run_modules(targets, config, on_result=None, timings=None):
+    """Run every applicable module concurrently and return their results in plan order.
+    Each module gets its own deadline and the whole job shares config['job_timeout'].
+    Modules that miss their deadline are reported with status 'timeout' and the rest
+    of the results are returned anyway (threads cannot be killed, so a late module
+    keeps running in the background until its own network timeouts fire).
+    on_result(index, result), if given, is called as soon as each module finishes, and
+    timings, if given, is filled with {module: wall time, status and request totals}.
+    """
+    plan = [(spec.name, spec, spec.input_type) for spec in plan_modules(targets, config.get('modules'))]
+    if not plan:
+        return []
+    timeouts = config.get('module_timeouts') or {}
+    started = time.monotonic()
+    job_deadline = started + float(config.get('job_timeout', JOB_TIMEOUT))
+    deadlines = [min(started + float(timeouts.get(source, spec.timeout)), job_deadline)
+                 for source, spec, _ in plan]
+    results = [None] * len(plan)
+    traces = [ModuleTrace(source) for source, _, _ in plan]
+
+    def finish(i, result):
+        source = plan[i][0]
+        wall = time.monotonic() - started
+        results[i] = result
+        METRICS.observe('osint_module_duration_seconds', {'module': source}, wall)
+        METRICS.inc('osint_module_runs_total', {'module': source, 'status': result['status']})
+        if timings is not None:
+            with traces[i].lock:
+                timings[source] = dict(traces[i].totals, wall_ms=round(wall * 1000, 1), status=result['status'],
+                                       cache_hit=bool(result.get('cached')), coalesced=bool(result.get('coalesced')),
+                                       events=list(traces[i].events))
+        if on_result:
+            on_result(i, result)
+
+    pool = ThreadPoolExecutor(max_workers=len(plan), thread_name_prefix='osint-module')
+    futures = {pool.submit(_run_spec, spec, targets[key], config, traces[i]): i
+               for i, (source, spec, key) in enumerate(plan)}
+    pending = set(futures)
+    try:
+        while pending:
+            timeout = max(0, min(deadlines[futures[f]] for f in pending) - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for f in done:
+                i = futures[f]
+                source, _, key = plan[i]
+                try:
+                    result = f.result()
+                    result['status'] = 'error' if result.get('error') else 'ok'
+                except Exception as e:
+                    result = _module_status(source, key, targets[key], 'error', str(e))
+                finish(i, result)
+            now = time.monotonic()
+            for f in [f for f in pending if deadlines[futures[f]] <= now]:
+                i = futures[f]
+                source, _, key = plan[i]
+                f.cancel()
+                pending.discard(f)
+                finish(i, _module_status(source, key, targets[key], 'timeout', 'deadline exceeded'))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
 # ------------------------- Report builder ----------------------------
 
-def build_report(targets, config):
+def _dump_profile(profiles, config):
+    import pstats
+    profile_dir = config.get('profile_dir') or 'profiles'
+    os.makedirs(profile_dir, exist_ok=True)
+    path = os.path.join(profile_dir, f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.prof")
+    stats = pstats.Stats(profiles[0])
+    for profile in profiles[1:]:
+        stats.add(profile)
+    stats.dump_stats(path)
+    return path
+
+def build_report(targets, config, on_result=None):
     """targets: dict with optional keys: email, domain, username
-    returns structured dict
+    returns structured dict; modules run concurrently (see run_modules)
+    With config['profile'] the module threads are profiled and a merged cProfile
+    dump is written to config['profile_dir'] (path under report['timings']['profile']).
+    Identical reports requested at the same time are built once and shared (unless
+    config['coalesce'] is False or on_result needs per-module events); report['coalesced']
+    says whether this report and how many of its module calls were shared.
     """
+    if on_result is not None or config.get('coalesce') is False or config.get('profile'):
+        return _build_report(targets, config, on_result)
+    report, shared = REPORT_FLIGHTS.do(coalesce_key('report', targets, config),
+                                       lambda: _build_report(targets, config))
+    if shared:
+        report['coalesced']['report'] = True
+    return report
+
+def _build_report(targets, config, on_result=None):
     report = {'generated_at': datetime.utcnow().isoformat() + 'Z', 'targets': targets, 'modules': []}
-    if 'email' in targets:
-        report['modules'].append(module_hibp(targets['email'], config))
-    if 'domain' in targets:
-        report['modules'].append(module_whois(targets['domain'], config))
-        report['modules'].append(module_dns(targets['domain'], config))
-        report['modules'].append(module_meta(targets['domain'], config))
-    if 'username' in targets:
-        report['modules'].append(module_username(targets['username'], config))
+    started = time.monotonic()
+    profiles = [] if config.get('profile') else None
+    if profiles is not None:
+        config = dict(config, _profiles=profiles)
+    timings = {}
+    report['modules'] = run_modules(targets, config, on_result=on_result, timings=timings)
+    hits = sum(1 for m in report['modules'] if m.get('cached'))
+    report['cache'] = {'hits': hits, 'misses': len(report['modules']) - hits}
+    report['coalesced'] = {'report': False, 'modules': sum(1 for m in report['modules'] if m.get('coalesced'))}
+    report['status'] = 'complete' if all(m['status'] == 'ok' for m in report['modules']) else 'partial'
+    elapsed = time.monotonic() - started
+    report['timings'] = {'total_ms': round(elapsed * 1000, 1), 'modules': timings}
+    if profiles:
+        report['timings']['profile'] = _dump_profile(profiles, config)
+    METRICS.observe('osint_report_duration_seconds', {}, elapsed)
+    METRICS.inc('osint_reports_total', {'status': report['status']})
     return report
 
 # ------------------------- Export to GraphML (simple) ----------------
 
-def report_to_graphml(report):
-    """Create a very simple GraphML containing nodes for email/domain/username and module findings.
-    Maltego can import GraphML/GraphML-like formats; adjust as needed for your Maltego edition.
+def iter_report_graphml(report):
+    """Yield the GraphML for a report in chunks, writing each node/edge as it is produced.
+    Same document as report_to_graphml without building the tree in memory, so large
+    reports can be streamed straight into a response or a file.
     """
-    NS = 'http://graphml.graphdrawing.org/xmlns'
-    graphml = ET.Element('graphml', xmlns=NS)
-    graph = ET.SubElement(graphml, 'graph', edgedefault='undirected')
-    nodes = []
+    from xml.sax.saxutils import escape
+    def attr(v):
+        return '"' + escape(str(v), {'"': '&quot;', '\n': '&#10;', '\r': '&#13;', '\t': '&#09;'}) + '"'
     node_id = 0
     def make_node(label, ntype):
         nonlocal node_id
         nid = f'n{node_id}'
         node_id += 1
-        n = ET.SubElement(graph, 'node', id=nid)
-        data = ET.SubElement(n, 'data', key='label')
-        data.text = f"{label} ({ntype})"
-        return nid
+        return nid, f'<node id="{nid}"><data key="label">{escape(f"{label} ({ntype})")}</data></node>'
+    yield b"<?xml version='1.0' encoding='utf-8'?>\n" \
+          b'<graphml xmlns="http://graphml.graphdrawing.org/xmlns"><graph edgedefault="undirected">'
     # target nodes
     tnodes = {}
+    parts = []
     for k,v in report['targets'].items():
-        tnodes[k] = make_node(v, k)
-    # module nodes and edges
+        tnodes[k], xml = make_node(v, k)
+        parts.append(xml)
+    yield ''.join(parts).encode('utf-8')
+    # module nodes and edges, one chunk per module
     for mod in report['modules']:
         label = mod.get('source')
         summary = ''
@@ -213,20 +1676,1114 @@ def report_to_graphml(report):
             summary = f"found_on:{len(mod.get('found_on') or [])}"
         if 'records' in mod:
             summary = 'dns_records'
-        mnode = make_node(label + '\\n' + summary, 'module')
+        if 'hosts' in mod:
+            summary = f"hosts:{len(mod.get('hosts') or [])}"
+        mnode, xml = make_node(label + '\\n' + summary, 'module')
+        parts = [xml]
         # connect to relevant target
-        if mod.get('email') and 'email' in tnodes:
-            e = ET.SubElement(graph, 'edge', source=tnodes['email'], target=mnode)
-        if mod.get('domain') and 'domain' in tnodes:
-            e = ET.SubElement(graph, 'edge', source=tnodes['domain'], target=mnode)
-        if mod.get('username') and 'username' in tnodes:
-            e = ET.SubElement(graph, 'edge', source=tnodes['username'], target=mnode)
-    # return XML bytes
-    return ET.tostring(graphml, encoding='utf-8', xml_declaration=True)
+        for key in ('email', 'domain', 'username', *(k for k in tnodes if k not in ('email', 'domain', 'username'))):
+            if mod.get(key) and key in tnodes:
+                parts.append(f'<edge source={attr(tnodes[key])} target={attr(mnode)} />')
+        yield ''.join(parts).encode('utf-8')
+        # nmap findings: one node per host and per open service (with its CVEs), chunk per host
+        for host in mod.get('hosts') or []:
+            hnode, xml = make_node(host.get('ip'), 'host')
+            parts = [xml, f'<edge source={attr(mnode)} target={attr(hnode)} />']
+            for port in host.get('ports') or []:
+                desc = ' '.join(str(port[k]) for k in ('service', 'product', 'version') if port.get(k))
+                if port.get('cves'):
+                    desc += ' [' + ', '.join(port['cves']) + ']'
+                pnode, xml = make_node(f"{port['port']}/{port['protocol']} {desc}".strip(), 'service')
+                parts += [xml, f'<edge source={attr(hnode)} target={attr(pnode)} />']
+            yield ''.join(parts).encode('utf-8')
+    yield b'</graph></graphml>'
 
-# ------------------------- Flask UI ---------------------------------
+def report_to_graphml(report):
+    """Create a very simple GraphML containing nodes for email/domain/username and module findings.
+    Maltego can import GraphML/GraphML-like formats; adjust as needed for your Maltego edition.
+    """
+    return b''.join(iter_report_graphml(report))
+
+# ------------------------- Background jobs ---------------------------
+
+JOB_WORKERS = 8
+JOB_RETENTION = 3600    # seconds a finished job stays available
+
+class Job:
+    """A build_report run in the background; module results are published as they finish."""
+
+    def __init__(self, targets, config):
+        self.id = uuid.uuid4().hex
+        self.targets = targets
+        self.config = config
+        self.state = 'queued'
+        self.created = time.time()
+        self.finished = None
+        self.events = []
+        self.report = None
+        self.cond = threading.Condition()
+
+    def publish(self, event, done=False):
+        with self.cond:
+            self.events.append(event)
+            if done:
+                self.state = 'done'
+                self.finished = time.time()
+            self.cond.notify_all()
+
+    def snapshot(self):
+        with self.cond:
+            modules = [e['module'] for e in self.events if e['event'] == 'module']
+            return {'job_id': self.id, 'state': self.state, 'targets': self.targets,
+                    'modules': modules, 'report': self.report}
+
+    def iter_events(self, keepalive=15):
+        """Yield every event (past and future) until the job is done; None on idle keepalive."""
+        sent = 0
+        while True:
+            with self.cond:
+                if sent == len(self.events) and self.state != 'done':
+                    self.cond.wait(timeout=keepalive)
+                new = self.events[sent:]
+                done = self.state == 'done'
+            sent += len(new)
+            if not new and not done:
+                yield None
+            for event in new:
+                yield event
+            if done and sent == len(self.events):
+                return
+
+class JobManager:
+    """Runs jobs on a bounded worker pool and keeps them for polling/streaming.
+    Submitting the same targets and config while such a job is queued or running
+    returns that job instead of starting another one.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, retention=JOB_RETENTION):
+        self.retention = retention
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='osint-job')
+        self.jobs = {}
+        self.inflight = {}      # coalesce_key -> unfinished job
+        self.lock = threading.Lock()
+
+    def submit(self, targets, config):
+        """Return (job, coalesced)."""
+        key = coalesce_key('report', targets, config) if config.get('coalesce') is not False else None
+        with self.lock:
+            self._prune()
+            job = self.inflight.get(key)
+            if job is not None:
+                METRICS.inc('osint_coalesced_total', {'level': 'job'})
+                return job, True
+            job = Job(targets, config)
+            self.jobs[job.id] = job
+            if key:
+                self.inflight[key] = job
+        self.pool.submit(self._run, job, key)
+        return job, False
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id in [j.id for j in self.jobs.values() if j.finished and j.finished < cutoff]:
+            del self.jobs[job_id]
+
+    def _run(self, job, key=None):
+        job.state = 'running'
+
+        def on_result(index, result):
+            job.publish({'event': 'module', 'index': index, 'module': result})
+
+        try:
+            job.report = build_report(job.targets, job.config, on_result=on_result)
+        except Exception as e:
+            job.report = {'targets': job.targets, 'modules': [], 'status': 'error', 'error': str(e)}
+        with self.lock:
+            self.inflight.pop(key, None)
+        job.publish({'event': 'done', 'report': job.report}, done=True)
+
+jobs = JobManager()
+
+# ------------------------- Batch mode --------------------------------
+
+def iter_batch_targets(path):
+    """Stream targets dicts from a CSV (columns email,domain,username) or JSONL file."""
+    keys = target_keys()
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        if path.lower().endswith(('.jsonl', '.ndjson')):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            yield {k: str(row[k]).strip() for k in keys if row.get(k) and str(row[k]).strip()}
+
+def _load_checkpoint(path):
+    done = set()
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            done.update(int(line) for line in f if line.strip())
+    return done
+
+_BATCH_INDEX_RE = re.compile(rb'"batch_index": (\d+)\}\s*$')
+
+def _recover_output(path, chunk=1 << 16):
+    """Repair the tail of a batch output after a crash and return the batch_index of its
+    last report. A partial last line is cut off; the last complete line may have been
+    written without its checkpoint entry, which is why its index is returned.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb+') as f:
+        end = f.seek(0, os.SEEK_END)
+        tail, pos = b'', end
+        # read backwards until the tail holds the last complete line and the newline before it
+        while pos > 0 and tail.count(b'\n') < 2:
+            step = min(chunk, pos)
+            pos -= step
+            f.seek(pos)
+            tail = f.read(step) + tail
+        if not tail.endswith(b'\n'):
+            cut = tail.rfind(b'\n') + 1
+            f.truncate(pos + cut)
+            tail = tail[:cut]
+        match = _BATCH_INDEX_RE.search(tail.rstrip(b'\n').rsplit(b'\n', 1)[-1]) if tail else None
+    return int(match.group(1)) if match else None
+
+def run_batch(input_path, output_path, config, workers=8, checkpoint_path=None):
+    """Run build_report over every target in input_path with bounded parallelism.
+    Each finished report is appended as one JSONL line (with its 'batch_index') and
+    its index is then appended to the checkpoint file, so an interrupted run resumes
+    where it stopped. A crash between those two writes is repaired on resume from the
+    output's last line, so no report is written twice. Reports are not kept in memory
+    once written. With config['archive_path'] they also go into that ReportArchive.
+    """
+    checkpoint_path = checkpoint_path or output_path + '.checkpoint'
+    done = _load_checkpoint(checkpoint_path)
+    last = _recover_output(output_path)
+    if last is not None and last not in done:
+        done.add(last)
+        with open(checkpoint_path, 'a', encoding='utf-8') as ckpt:
+            ckpt.write(f'{last}\n')
+    archive = get_archive(config) if config.get('archive_path') else None
+    max_inflight = workers * 2
+    written = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='osint-batch') as pool, \
+            open(output_path, 'a', encoding='utf-8') as out, \
+            open(checkpoint_path, 'a', encoding='utf-8') as ckpt:
+        inflight = {}
+
+        def drain():
+            nonlocal written
+            finished, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+            for f in finished:
+                index, targets = inflight.pop(f)
+                try:
+                    report = f.result()
+                except Exception as e:
+                    report = {'targets': targets, 'modules': [], 'status': 'error', 'error': str(e)}
+                report['batch_index'] = index
+                out.write(json.dumps(report, ensure_ascii=False, default=str) + '\n')
+                out.flush()
+                ckpt.write(f'{index}\n')
+                ckpt.flush()
+                if archive:
+                    archive.add(report)
+                written += 1
+                if written % 100 == 0:
+                    print(f'[+] {written} reports written', file=sys.stderr)
+
+        for index, targets in enumerate(iter_batch_targets(input_path)):
+            if index in done or not targets:
+                continue
+            while len(inflight) >= max_inflight:
+                drain()
+            inflight[pool.submit(build_report, targets, config)] = (index, targets)
+        while inflight:
+            drain()
+    return written
+
+# ------------------------- History & monitoring ----------------------
+
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'osint_history.sqlite3')
+
+# Freshness window (seconds) per module in monitor mode: a module is re-run only once
+# its last successful result is older than this; override with config['freshness']
+MONITOR_FRESHNESS = {
+    'haveibeenpwned': 24 * 3600,
+    'whois': 7 * 24 * 3600,
+    'dns': 24 * 3600,
+    'domain_meta': 24 * 3600,
+    'username': 3 * 24 * 3600,
+}
+DEFAULT_FRESHNESS = 24 * 3600
+
+# Response headers that change on every request and are left out of the meta diff
+VOLATILE_HEADERS = {'date', 'expires', 'age', 'set-cookie', 'etag', 'last-modified', 'content-length',
+                    'x-request-id', 'x-cache', 'x-cache-hits', 'x-served-by', 'x-timer', 'cf-ray',
+                    'server-timing', 'report-to', 'nel', 'via', 'keep-alive'}
+
+class ReportHistory:
+    """SQLite store of the last successful result of every module per asset, plus
+    the deltas produced by monitor(). An asset is a normalized targets dict.
+    """
+
+    def __init__(self, path=HISTORY_PATH):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS snapshots (asset TEXT, module TEXT, checked REAL, '
+                              'result TEXT, PRIMARY KEY (asset, module))')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS deltas (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                              'asset TEXT, generated_at TEXT, delta TEXT)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS deltas_asset ON deltas (asset, id)')
+
+    @staticmethod
+    def asset_key(targets):
+        return json.dumps({k: str(v).strip().lower() for k, v in targets.items()}, sort_keys=True)
+
+    def latest(self, asset):
+        """{module: (checked timestamp, result)} for an asset."""
+        with self._lock:
+            rows = self.conn.execute('SELECT module, checked, result FROM snapshots WHERE asset = ?',
+                                     (asset,)).fetchall()
+        return {module: (checked, json.loads(result)) for module, checked, result in rows}
+
+    def save(self, asset, results, checked):
+        with self._lock, self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)',
+                                  [(asset, r['source'], checked, json.dumps(r, default=str)) for r in results])
+
+    def add_delta(self, asset, delta):
+        with self._lock, self.conn:
+            self.conn.execute('INSERT INTO deltas (asset, generated_at, delta) VALUES (?, ?, ?)',
+                              (asset, delta['generated_at'], json.dumps(delta, default=str)))
+
+    def deltas(self, asset=None, limit=100):
+        """Most recent deltas first, optionally for one asset."""
+        with self._lock:
+            if asset is None:
+                rows = self.conn.execute('SELECT delta FROM deltas ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+            else:
+                rows = self.conn.execute('SELECT delta FROM deltas WHERE asset = ? ORDER BY id DESC LIMIT ?',
+                                         (asset, limit)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+_histories = {}
+
+def get_history(config):
+    path = config.get('history_path') or HISTORY_PATH
+    with _caches_lock:
+        if path not in _histories:
+            _histories[path] = ReportHistory(path)
+        return _histories[path]
+
+def _added_removed(old, new):
+    old, new = set(old), set(new)
+    change = {}
+    if new - old:
+        change['added'] = sorted(new - old)
+    if old - new:
+        change['removed'] = sorted(old - new)
+    return change
+
+def _diff_hibp(old, new):
+    change = {}
+    names = lambda m, k, f: [f(b) for b in m.get(k) or []]
+    breaches = _added_removed(names(old, 'breaches', lambda b: b.get('Name')),
+                              names(new, 'breaches', lambda b: b.get('Name')))
+    if breaches.get('added'):
+        change['new_breaches'] = breaches['added']
+    pastes = _added_removed(names(old, 'pastes', lambda p: f"{p.get('Source')}:{p.get('Id')}"),
+                            names(new, 'pastes', lambda p: f"{p.get('Source')}:{p.get('Id')}"))
+    if pastes.get('added'):
+        change['new_pastes'] = pastes['added']
+    return change
+
+def _diff_dns(old, new):
+    change = {}
+    old_records, new_records = old.get('records') or {}, new.get('records') or {}
+    records = {}
+    for rtype in sorted(set(old_records) | set(new_records)):
+        diff = _added_removed(old_records.get(rtype) or [], new_records.get(rtype) or [])
+        if diff:
+            records[rtype] = diff
+    if records:
+        change['records'] = records
+    if 'subdomains' in new:
+        subs = _added_removed(old.get('subdomains') or {}, new.get('subdomains') or {})
+        if subs:
+            change['subdomains'] = subs
+    return change
+
+def _diff_username(old, new):
+    services = lambda m: [h.get('service') if isinstance(h, dict) else h for h in m.get('found_on') or []]
+    diff = _added_removed(services(old), services(new))
+    change = {}
+    if diff.get('added'):
+        change['new_hits'] = diff['added']
+    if diff.get('removed'):
+        change['gone'] = diff['removed']
+    return change
+
+def _diff_meta(old, new):
+    change = {}
+    old_http, new_http = old.get('http') or {}, new.get('http') or {}
+    for key in ('title', 'status_code', 'url', 'favicon_hash'):
+        if old_http.get(key) != new_http.get(key):
+            change[key] = {'old': old_http.get(key), 'new': new_http.get(key)}
+    headers = lambda h: {k.lower(): v for k, v in (h.get('headers') or {}).items() if k.lower() not in VOLATILE_HEADERS}
+    old_headers, new_headers = headers(old_http), headers(new_http)
+    changed = {k: {'old': old_headers.get(k), 'new': new_headers.get(k)}
+               for k in sorted(set(old_headers) | set(new_headers)) if old_headers.get(k) != new_headers.get(k)}
+    if changed:
+        change['headers'] = changed
+    return change
+
+def _diff_generic(old, new, key):
+    old_fields, new_fields = old.get(key) or {}, new.get(key) or {}
+    changed = {k: {'old': old_fields.get(k), 'new': new_fields.get(k)}
+               for k in sorted(set(old_fields) | set(new_fields))
+               if json.dumps(old_fields.get(k), default=str) != json.dumps(new_fields.get(k), default=str)}
+    return {key: changed} if changed else {}
+
+# Per-module diff of two successful results; other modules get a field-by-field diff
+DIFFERS = {
+    'haveibeenpwned': _diff_hibp,
+    'dns': _diff_dns,
+    'username': _diff_username,
+    'domain_meta': _diff_meta,
+    'whois': lambda old, new: _diff_generic(old, new, 'whois_raw'),
+}
+
+def diff_module(source, old, new):
+    """Compact change set between two results of the same module ({} if nothing relevant changed)."""
+    differ = DIFFERS.get(source)
+    if differ is not None:
+        return differ(old, new)
+    volatile = ('status', 'cached', 'errors')
+    strip = lambda m: {k: v for k, v in m.items() if k not in volatile}
+    return _diff_generic({'result': strip(old)}, {'result': strip(new)}, 'result')
+
+def monitor(targets, config, history=None):
+    """Incremental re-scan of one asset against its history.
+    Only the modules whose last successful result is older than their freshness window
+    are run (bypassing the module cache); their results are diffed against the previous
+    snapshot and stored. A module with failed queries ('error' or 'errors') is reported
+    in 'errors' and keeps its previous snapshot. Returns a delta: {'targets', 'generated_at', 'checked', 'fresh',
+    'baseline', 'changes': {module: change set}, 'errors': {module: error}}.
+    """
+    history = history or get_history(config)
+    asset = history.asset_key(targets)
+    previous = history.latest(asset)
+    freshness = dict(MONITOR_FRESHNESS, **(config.get('freshness') or {}))
+    now = time.time()
+    due, fresh = [], []
+    for spec in plan_modules(targets, config.get('modules')):
+        checked = previous.get(spec.name, (0, None))[0]
+        (due if now - checked >= freshness.get(spec.name, DEFAULT_FRESHNESS) else fresh).append(spec.name)
+    delta = {'targets': targets, 'generated_at': datetime.utcnow().isoformat() + 'Z',
+             'checked': due, 'fresh': fresh, 'baseline': [], 'changes': {}, 'errors': {}}
+    if not due:
+        return delta
+    report = build_report(targets, dict(config, modules=due, force_refresh=due))
+    ok = []
+    for result in report['modules']:
+        source = result['source']
+        if result['status'] != 'ok' or result.get('errors'):
+            # some of its queries failed, so missing values are not real removals: skip the
+            # diff and keep the previous snapshot so the module is retried on the next run
+            delta['errors'][source] = result.get('error') or '; '.join(result.get('errors') or ()) or result['status']
+            continue
+        ok.append(result)
+        if source not in previous:
+            delta['baseline'].append(source)
+            continue
+        change = diff_module(source, previous[source][1], result)
+        if change:
+            delta['changes'][source] = change
+    history.save(asset, ok, now)
+    if delta['changes'] or delta['errors']:
+        history.add_delta(asset, delta)
+    return delta
 
-app = Flask(__name__)
+def run_monitor(input_path, output_path, config, workers=8, all_deltas=False):
+    """monitor() every target in input_path with bounded parallelism.
+    Deltas with changes or errors (every delta with all_deltas) are appended to
+    output_path as JSONL. Returns (assets checked, deltas written).
+    """
+    history = get_history(config)
+    max_inflight = workers * 2
+    checked = written = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='osint-monitor') as pool, \
+            open(output_path, 'a', encoding='utf-8') as out:
+        inflight = {}
+
+        def drain(block):
+            nonlocal checked, written
+            finished, _ = wait(list(inflight), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for f in finished:
+                targets = inflight.pop(f)
+                try:
+                    delta = f.result()
+                except Exception as e:
+                    delta = {'targets': targets, 'changes': {}, 'errors': {'monitor': str(e)}}
+                checked += 1
+                if all_deltas or delta['changes'] or delta['errors']:
+                    out.write(json.dumps(delta, ensure_ascii=False, default=str) + '\n')
+                    out.flush()
+                    written += 1
+
+        for targets in iter_batch_targets(input_path):
+            if not targets:
+                continue
+            while len(inflight) >= max_inflight:
+                drain(block=True)
+            inflight[pool.submit(monitor, targets, config, history)] = targets
+        while inflight:
+            drain(block=True)
+    return checked, written
+
+# ------------------------- Entity store -----------------------------
+
+def normalize_value(etype, value):
+    """Canonical form of an entity value, so the same IP/host/email always maps to one node."""
+    value = str(value).strip()
+    if etype == 'IP':
+        import ipaddress
+        try:
+            return ipaddress.ip_address(value).compressed
+        except ValueError:
+            return value
+    if etype in ('Email', 'Domain', 'Nameserver', 'MailServer', 'Username', 'FaviconHash'):
+        return value.rstrip('.').lower()
+    return value
+
+def _merge_properties(dst, src):
+    for k, v in (src or {}).items():
+        if v in (None, '', [], {}):
+            continue
+        old = dst.get(k)
+        if isinstance(old, list) and isinstance(v, list):
+            old.extend(x for x in v if x not in old)
+        else:
+            dst[k] = v
+
+class EntityStore:
+    """Deduplicated entities/links graph built from orchestrator reports.
+    Entities are indexed by (type, normalized value) and get a stable id derived from
+    it, so the same IP, nameserver, MX host or breach seen in any number of reports
+    is a single node whose properties are merged; links are deduplicated by
+    (source, target, type). Reports are added one at a time (add_report), so large
+    batches can be merged while they are streamed in.
+    """
+
+    def __init__(self):
+        self.ids = {}        # (type, normalized value) -> id
+        self.entities = {}   # id -> entity
+        self.links = {}      # (source, target, type) -> link
+        self.reports = 0
+
+    @staticmethod
+    def make_id(etype, norm):
+        return f"{etype.lower()}_{hashlib.sha1(norm.encode('utf-8')).hexdigest()}"
+
+    def add_entity(self, etype, value, properties=None):
+        norm = normalize_value(etype, value)
+        key = (etype, norm)
+        eid = self.ids.get(key)
+        if eid is None:
+            eid = self.ids[key] = self.make_id(etype, norm)
+            self.entities[eid] = {'id': eid, 'type': etype, 'value': norm, 'properties': {}}
+        _merge_properties(self.entities[eid]['properties'], properties)
+        return eid
+
+    def add_link(self, source, target, ltype, properties=None):
+        key = (source, target, ltype)
+        link = self.links.get(key)
+        if link is None:
+            link = self.links[key] = {'source': source, 'target': target, 'type': ltype, 'properties': {}}
+        _merge_properties(link['properties'], properties)
+        return link
+
+    def add_report(self, report):
+        """Convert one {'targets', 'modules'} report and merge it into the store."""
+        self.reports += 1
+        tids = {}
+        for key, etype in TARGET_ENTITY_TYPES.items():
+            if report.get('targets', {}).get(key):
+                tids[key] = self.add_entity(etype, report['targets'][key])
+        for mod in report.get('modules') or []:
+            converter = REPORT_CONVERTERS.get(mod.get('source'))
+            spec = MODULES.get(mod.get('source'))
+            key = spec.input_type if spec else next((k for k in tids if mod.get(k)), None)
+            if converter is None or not mod.get(key):
+                continue
+            subject = tids.get(key) or self.add_entity(TARGET_ENTITY_TYPES.get(key, key.title()), mod[key])
+            converter(self, subject, mod)
+
+    def iter_entities(self):
+        return iter(self.entities.values())
+
+    def iter_links(self):
+        return iter(self.links.values())
+
+    def to_graph(self):
+        return {'entities': list(self.iter_entities()), 'links': list(self.iter_links())}
+
+    def write(self, path):
+        write_graph(path, self.iter_entities(), self.iter_links())
+
+def write_graph(path, entities, links):
+    """Write a graph as {"entities": [...], "links": [...]} JSON, or one record per line for .jsonl."""
+    with open(path, 'w', encoding='utf-8') as f:
+        dump = lambda r: json.dumps(r, ensure_ascii=False, default=str)
+        if path.lower().endswith(('.jsonl', '.ndjson')):
+            for r in entities:
+                f.write(dump(r) + '\n')
+            for r in links:
+                f.write(dump(r) + '\n')
+            return
+        f.write('{"entities": [\n')
+        for i, r in enumerate(entities):
+            f.write((',\n' if i else '') + dump(r))
+        f.write('\n],\n"links": [\n')
+        for i, r in enumerate(links):
+            f.write((',\n' if i else '') + dump(r))
+        f.write('\n]}\n')
+
+TARGET_ENTITY_TYPES = {'email': 'Email', 'domain': 'Domain', 'username': 'Username', 'nmap_xml': 'NmapScan'}
+
+def _convert_hibp(store, subject, mod):
+    for b in mod.get('breaches') or []:
+        props = {k: b[k] for k in ('Title', 'Domain', 'BreachDate', 'PwnCount', 'DataClasses') if b.get(k)}
+        store.add_link(subject, store.add_entity('Breach', b.get('Name'), props), 'breached_in')
+    for p in mod.get('pastes') or []:
+        paste = store.add_entity('Paste', f"{p.get('Source')}:{p.get('Id')}",
+                                 {k: p[k] for k in ('Title', 'Date', 'EmailCount') if p.get(k)})
+        store.add_link(subject, paste, 'pasted_in')
+
+def _as_list(v):
+    if not v:
+        return []
+    return v if isinstance(v, list) else [v]
+
+def _convert_whois(store, subject, mod):
+    w = mod.get('whois_raw') or {}
+    props = {k: str(_as_list(w.get(k))[0]) for k in ('creation_date', 'expiration_date', 'updated_date')
+             if _as_list(w.get(k))}
+    store.add_entity('Domain', store.entities[subject]['value'], props)
+    for registrar in _as_list(w.get('registrar')):
+        store.add_link(subject, store.add_entity('Registrar', registrar), 'registered_with')
+    for email in _as_list(w.get('emails')):
+        store.add_link(subject, store.add_entity('Email', email), 'whois_contact')
+    for ns in _as_list(w.get('name_servers')):
+        store.add_link(subject, store.add_entity('Nameserver', ns), 'whois_ns')
+    for org in _as_list(w.get('org')):
+        store.add_link(subject, store.add_entity('Organization', org), 'registrant')
+
+def _convert_dns(store, subject, mod):
+    records = mod.get('records') or {}
+    for ip in records.get('A') or []:
+        store.add_link(subject, store.add_entity('IP', ip), 'resolves_to')
+    for mx in records.get('MX') or []:
+        pref, _, host = mx.partition(' ')
+        store.add_link(subject, store.add_entity('MailServer', host or pref), 'mx',
+                       {'preference': pref} if host else None)
+    for ns in records.get('NS') or []:
+        store.add_link(subject, store.add_entity('Nameserver', ns), 'ns')
+    for cname in records.get('CNAME') or []:
+        store.add_link(subject, store.add_entity('Domain', cname), 'cname')
+    props = {'txt': records['TXT']} if records.get('TXT') else {}
+    if records.get('SOA'):
+        props['soa'] = records['SOA'][0]
+    store.add_entity('Domain', store.entities[subject]['value'], props)
+    for host, ips in (mod.get('subdomains') or {}).items():
+        sub = store.add_entity('Domain', host)
+        store.add_link(subject, sub, 'subdomain')
+        for ip in ips:
+            store.add_link(sub, store.add_entity('IP', ip), 'resolves_to')
+
+def _convert_meta(store, subject, mod):
+    http = mod.get('http') or {}
+    headers = {k.lower(): v for k, v in (http.get('headers') or {}).items()}
+    props = {'title': http.get('title'), 'http_status': http.get('status_code'), 'url': http.get('url'),
+             'server': headers.get('server')}
+    store.add_entity('Domain', store.entities[subject]['value'], props)
+    if http.get('favicon_hash') is not None:
+        icon = store.add_entity('FaviconHash', str(http['favicon_hash']),
+                                {'md5': http.get('favicon_md5'), 'favicon': http.get('favicon')})
+        store.add_link(subject, icon, 'favicon')
+
+def _convert_username(store, subject, mod):
+    for hit in mod.get('found_on') or []:
+        if isinstance(hit, dict):
+            account = store.add_entity('Account', hit.get('url') or hit.get('service'),
+                                       {'service': hit.get('service'), 'status': hit.get('status')})
+        else:
+            account = store.add_entity('Account', hit)
+        store.add_link(subject, account, 'has_account')
+
+def _convert_nmap(store, subject, mod):
+    for host in mod.get('hosts') or []:
+        if not host.get('ip'):
+            continue
+        ip = store.add_entity('IP', host['ip'], {'hostnames': host.get('hostnames'), 'mac': host.get('mac')})
+        store.add_link(subject, ip, 'scanned')
+        for name in host.get('hostnames') or []:
+            store.add_link(store.add_entity('Domain', name), ip, 'resolves_to')
+        for port in host['ports']:
+            service = store.add_entity('Service', f"{host['ip']}:{port['port']}/{port['protocol']}",
+                                       {k: port.get(k) for k in ('service', 'product', 'version', 'cpe', 'cves')})
+            store.add_link(ip, service, 'has_port')
+            for cve in port.get('cves') or []:
+                store.add_link(service, store.add_entity('CVE', cve), 'vulnerable_to')
+
+# Report module -> converter(store, subject entity id, module result)
+REPORT_CONVERTERS = {
+    'haveibeenpwned': _convert_hibp,
+    'whois': _convert_whois,
+    'dns': _convert_dns,
+    'domain_meta': _convert_meta,
+    'username': _convert_username,
+    'nmap': _convert_nmap,
+}
+
+def iter_reports(path):
+    """Stream reports from a JSON report, a JSON list of reports or a JSONL file (batch output)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.lower().endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        data = json.load(f)
+    yield from data if isinstance(data, list) else [data]
+
+def convert_reports(paths, output_path, store=None):
+    """Merge every report in paths into one entities/links graph and write it to output_path."""
+    store = store or EntityStore()
+    for path in paths:
+        for report in iter_reports(path):
+            store.add_report(report)
+    store.write(output_path)
+    return store
+
+# ------------------------- Pivoting ---------------------------------
+
+PIVOT_DEPTH = 2             # hops from the seeds; override with config['pivot_depth']
+PIVOT_FANOUT = 20           # new targets taken from one report; config['pivot_fanout']
+PIVOT_MAX_TARGETS = 200     # total targets per pivot run; config['pivot_max_targets']
+PIVOT_WORKERS = 8           # targets of one frontier level run at once; config['pivot_workers']
+
+# Big providers never worth pivoting into; extend with config['pivot_scope']['exclude']
+PIVOT_EXCLUDE = ('google.com', 'googlemail.com', 'gmail.com', 'outlook.com', 'hotmail.com',
+                 'microsoft.com', 'office365.com', 'cloudflare.com', 'cloudflare.net', 'amazonaws.com',
+                 'awsdns.com', 'akamai.net', 'akamaiedge.net', 'fastly.net', 'googleapis.com',
+                 'gstatic.com', 'facebook.com', 'twitter.com', 'github.com', 'wordpress.com')
+
+def _host(value):
+    return str(value).strip().rstrip('.').lower()
+
+def _base_domain(host):
+    """Approximate registrable domain (example.com, example.co.uk) used as default scope."""
+    labels = host.split('.')
+    if len(labels) >= 3 and len(labels[-1]) == 2 and labels[-2] in ('co', 'com', 'org', 'net', 'gov', 'ac', 'edu'):
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+def extract_pivots(result):
+    """Artifacts in one module result that can become new targets: [(target key, value, via)]."""
+    source = result.get('source')
+    found = []
+    if source == 'dns':
+        records = result.get('records') or {}
+        for mx in records.get('MX') or []:
+            found.append(('domain', mx.split()[-1], 'mx'))
+        found += [('domain', ns, 'ns') for ns in records.get('NS') or []]
+        found += [('domain', c, 'cname') for c in records.get('CNAME') or []]
+        found += [('domain', h, 'subdomain') for h in result.get('subdomains') or {}]
+    elif source == 'whois':
+        w = result.get('whois_raw') or {}
+        found += [('email', e, 'whois_contact') for e in _as_list(w.get('emails'))]
+        found += [('domain', ns, 'whois_ns') for ns in _as_list(w.get('name_servers'))]
+    elif source == 'domain_meta':
+        http = result.get('http') or {}
+        found += [('domain', h, 'head_link') for h in http.get('link_hosts') or []]
+        if http.get('favicon'):
+            found.append(('domain', urlparse(http['favicon']).hostname or '', 'favicon_host'))
+    return [(key, _host(value), via) for key, value, via in found if value]
+
+class PivotScope:
+    """Which discovered artifacts may become targets.
+    config['pivot_scope']: {'domains': [suffixes] or ['*'] (default: base domains of the
+    seeds), 'exclude': [suffixes] (added to PIVOT_EXCLUDE), 'types': [target keys]}.
+    """
+
+    def __init__(self, seeds, config):
+        scope = config.get('pivot_scope') or {}
+        domains = scope.get('domains')
+        if domains is None:
+            domains = {_base_domain(_host(v).rpartition('@')[2]) for k, v in seeds.items() if k in ('domain', 'email')}
+        self.any_domain = '*' in domains
+        self.domains = tuple(_host(d) for d in domains if d != '*')
+        self.exclude = PIVOT_EXCLUDE + tuple(_host(d) for d in scope.get('exclude') or ())
+        self.types = set(scope.get('types') or target_keys())
+
+    @staticmethod
+    def _under(host, suffixes):
+        return any(host == s or host.endswith('.' + s) for s in suffixes)
+
+    def allows(self, key, value):
+        if key not in self.types:
+            return False
+        if key in ('domain', 'email'):
+            host = value.rpartition('@')[2]
+            if self._under(host, self.exclude):
+                return False
+            return self.any_domain or self._under(host, self.domains)
+        return True
+
+_PIVOT_ENTITY = {'mx': 'MailServer', 'ns': 'Nameserver', 'whois_ns': 'Nameserver'}
+
+def pivot(seeds, config, on_report=None):
+    """Recursive pivoting from seeds (a targets dict) as a breadth-first search.
+    Every report's artifacts (extract_pivots) that pass the scope and have not been
+    seen go into the frontier as new single-key targets; each frontier level runs
+    concurrently through build_report (config['pivot_modules'] restricts the modules
+    run on pivoted targets), up to the depth, fan-out and total target limits.
+    Returns {'graph': entities/links with every pivot step as an edge, 'pivots': steps,
+    'reports' (unless on_report(report) consumes them), 'stats'}.
+    """
+    depth_limit = int(config.get('pivot_depth', PIVOT_DEPTH))
+    fanout = int(config.get('pivot_fanout', PIVOT_FANOUT))
+    max_targets = int(config.get('pivot_max_targets', PIVOT_MAX_TARGETS))
+    scope = PivotScope(seeds, config)
+    pivot_config = dict(config, modules=config['pivot_modules']) if config.get('pivot_modules') else config
+    store = EntityStore()
+    reports, steps = [], []
+    stats = {'targets': 1, 'depth': 0, 'out_of_scope': 0, 'seen': 0, 'truncated': 0}
+    seen = {(k, _host(v)) for k, v in seeds.items()}
+    # frontier entries: (targets, depth, via)
+    frontier = deque([(seeds, 0, None)])
+    with ThreadPoolExecutor(max_workers=int(config.get('pivot_workers', PIVOT_WORKERS)),
+                            thread_name_prefix='osint-pivot') as pool:
+        while frontier:
+            level = []
+            depth = frontier[0][1]
+            while frontier and frontier[0][1] == depth:
+                level.append(frontier.popleft())
+            stats['depth'] = depth
+            futures = [pool.submit(build_report, targets, config if d == 0 else pivot_config)
+                       for targets, d, _ in level]
+            for (targets, d, via), f in zip(level, futures):
+                report = f.result()
+                report['pivot'] = {'depth': d, 'via': via}
+                store.add_report(report)
+                if on_report:
+                    on_report(report)
+                else:
+                    reports.append(report)
+                if d >= depth_limit:
+                    continue
+                taken = 0
+                for mod in report['modules']:
+                    subject_key = MODULES[mod['source']].input_type if mod['source'] in MODULES else None
+                    if not mod.get(subject_key):
+                        continue
+                    subject = store.add_entity(TARGET_ENTITY_TYPES.get(subject_key, subject_key.title()),
+                                               mod[subject_key])
+                    for new_key, new_value, new_via in extract_pivots(mod):
+                        if (new_key, new_value) in seen:
+                            stats['seen'] += 1
+                            continue
+                        if not scope.allows(new_key, new_value):
+                            stats['out_of_scope'] += 1
+                            continue
+                        if taken >= fanout or stats['targets'] >= max_targets:
+                            stats['truncated'] += 1
+                            continue
+                        seen.add((new_key, new_value))
+                        taken += 1
+                        stats['targets'] += 1
+                        # MX hosts and nameservers keep their own node (linked by the report
+                        # converters) and pivot from it; other artifacts link from the subject
+                        artifact = _PIVOT_ENTITY.get(new_via)
+                        origin = store.add_entity(artifact, new_value) if artifact else subject
+                        child = store.add_entity(TARGET_ENTITY_TYPES.get(new_key, new_key.title()), new_value)
+                        store.add_link(origin, child, 'pivot' if artifact else new_via, {'pivot_depth': d + 1})
+                        steps.append({'from': mod[subject_key], 'to': new_value, 'type': new_key,
+                                      'via': new_via, 'depth': d + 1})
+                        frontier.append(({new_key: new_value}, d + 1, new_via))
+    return {'seeds': seeds, 'graph': store.to_graph(), 'pivots': steps, 'reports': reports, 'stats': stats}
+
+# ------------------------- Report archive ---------------------------
+
+ARCHIVE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'osint_archive.sqlite3')
+ARCHIVE_BATCH = 500     # reports per transaction when importing
+ARCHIVE_DICT_SAMPLES = 16           # first reports whose JSON becomes the compression dictionary
+ARCHIVE_DICT_SIZE = 32 * 1024       # zlib only looks back 32 KB
+
+# Entity type (see EntityStore) -> archive index kind
+ARCHIVE_ENTITY_KINDS = {
+    'Email': 'email', 'Domain': 'domain', 'Username': 'username', 'IP': 'ip', 'Nameserver': 'ns',
+    'MailServer': 'mx', 'Breach': 'breach', 'FaviconHash': 'favicon', 'Registrar': 'registrar', 'CVE': 'cve',
+}
+# Index kinds taken from entity properties instead: kind -> (entity type, property)
+ARCHIVE_PROPERTY_KINDS = {'server': ('Domain', 'server'), 'title': ('Domain', 'title'), 'service': ('Account', 'service')}
+ARCHIVE_KINDS = tuple(ARCHIVE_ENTITY_KINDS.values()) + tuple(ARCHIVE_PROPERTY_KINDS)
+
+def archive_value(kind, value):
+    """Normalized form under which an artifact is indexed and looked up."""
+    if kind == 'ip':
+        return normalize_value('IP', value)
+    return ' '.join(str(value).split()).rstrip('.').lower()
+
+def report_artifacts(report):
+    """{(kind, value)} indexed for a report: the entities the converters produce from it."""
+    store = EntityStore()
+    store.add_report(report)
+    found = set()
+    for entity in store.iter_entities():
+        kind = ARCHIVE_ENTITY_KINDS.get(entity['type'])
+        if kind:
+            found.add((kind, archive_value(kind, entity['value'])))
+        for pkind, (etype, prop) in ARCHIVE_PROPERTY_KINDS.items():
+            if entity['type'] == etype and entity['properties'].get(prop):
+                found.add((pkind, archive_value(pkind, entity['properties'][prop])))
+    return found
+
+class ReportArchive:
+    """Compact SQLite archive of reports with inverted indexes over their artifacts.
+    Reports are stored once (by content digest) as compressed JSON (zstd when the
+    zstandard package is installed, zlib otherwise). Single reports are too small to
+    compress well on their own, so once ARCHIVE_DICT_SAMPLES reports are in, their
+    JSON becomes a preset dictionary for the rest. Every artifact (IP, NS/MX
+    host, breach, username service, HTTP server header, title, favicon hash...) has
+    a posting list of the reports it appears in, so pivots across thousands of
+    reports are two index lookups instead of a scan.
+    """
+
+    def __init__(self, path=ARCHIVE_PATH):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self.conn:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS reports (id INTEGER PRIMARY KEY, digest BLOB UNIQUE, '
+                              'asset TEXT, generated_at TEXT, codec TEXT, data BLOB)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS artifacts (id INTEGER PRIMARY KEY, kind TEXT, value TEXT, '
+                              'UNIQUE (kind, value))')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS postings (artifact INTEGER, report INTEGER, '
+                              'PRIMARY KEY (artifact, report)) WITHOUT ROWID')
+            # report -> artifacts, for related()
+            self.conn.execute('CREATE INDEX IF NOT EXISTS postings_report ON postings (report, artifact)')
+            # newest report of every asset, for latest=True
+            self.conn.execute('CREATE TABLE IF NOT EXISTS latest (asset TEXT PRIMARY KEY, report INTEGER) WITHOUT ROWID')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS dictionaries (id INTEGER PRIMARY KEY, data BLOB)')
+            self._dicts = dict(self.conn.execute('SELECT id, data FROM dictionaries').fetchall())
+        self._dict_id = max(self._dicts) if self._dicts else None
+        self._samples = []
+
+    def _dictionary(self, did):
+        if did not in self._dicts:
+            # created by another process after this one opened the archive
+            row = self.conn.execute('SELECT data FROM dictionaries WHERE id = ?', (did,)).fetchone()
+            self._dicts[did] = row[0]
+        return self._dicts[did]
+
+    def _pack(self, raw):
+        # caller holds the lock and the transaction; returns (codec, compressed data)
+        import zlib
+        zstd = optional_import('zstandard')
+        name = 'zstd' if zstd else 'zlib'
+        did = self._dict_id
+        if did is None:
+            self._samples.append(raw)
+            if len(self._samples) >= ARCHIVE_DICT_SAMPLES:
+                data = b''.join(self._samples)[-ARCHIVE_DICT_SIZE:]
+                self._dict_id = self.conn.execute('INSERT INTO dictionaries (data) VALUES (?)', (data,)).lastrowid
+                self._dicts[self._dict_id] = data
+                self._samples = []
+            return name, zstd.ZstdCompressor(level=10).compress(raw) if zstd else zlib.compress(raw, 9)
+        zdict = self._dictionary(did)
+        if zstd:
+            zdict = zstd.ZstdCompressionDict(zdict, dict_type=zstd.DICT_TYPE_RAWCONTENT)
+            return f'zstd:{did}', zstd.ZstdCompressor(level=10, dict_data=zdict).compress(raw)
+        co = zlib.compressobj(9, zdict=zdict)
+        return f'zlib:{did}', co.compress(raw) + co.flush()
+
+    def _unpack(self, codec, data):
+        name, _, did = codec.partition(':')
+        zdict = self._dictionary(int(did)) if did else None
+        if name == 'zstd':
+            zstd = optional_import('zstandard')
+            if zstd is None:
+                raise RuntimeError('report stored with zstd: pip install zstandard')
+            if zdict is not None:
+                zdict = zstd.ZstdCompressionDict(zdict, dict_type=zstd.DICT_TYPE_RAWCONTENT)
+            return json.loads(zstd.ZstdDecompressor(dict_data=zdict).decompress(data))
+        import zlib
+        if zdict is None:
+            return json.loads(zlib.decompress(data))
+        do = zlib.decompressobj(zdict=zdict)
+        return json.loads(do.decompress(data) + do.flush())
+
+    def _add(self, report):
+        # caller holds the lock and the transaction
+        raw = json.dumps(report, ensure_ascii=False, separators=(',', ':'), sort_keys=True, default=str).encode('utf-8')
+        digest = hashlib.sha256(raw).digest()[:16]
+        if self.conn.execute('SELECT 1 FROM reports WHERE digest = ?', (digest,)).fetchone():
+            return None
+        codec, data = self._pack(raw)
+        asset = ReportHistory.asset_key(report.get('targets') or {})
+        cur = self.conn.execute('INSERT OR IGNORE INTO reports (digest, asset, generated_at, codec, data) '
+                                'VALUES (?, ?, ?, ?, ?)', (digest, asset, report.get('generated_at'), codec, data))
+        if not cur.rowcount:
+            return None
+        rid = cur.lastrowid
+        row = self.conn.execute('SELECT r.generated_at FROM latest l JOIN reports r ON r.id = l.report '
+                                'WHERE l.asset = ?', (asset,)).fetchone()
+        if row is None or (report.get('generated_at') or '') >= (row[0] or ''):
+            self.conn.execute('INSERT OR REPLACE INTO latest VALUES (?, ?)', (asset, rid))
+        artifacts = sorted(report_artifacts(report))
+        self.conn.executemany('INSERT OR IGNORE INTO artifacts (kind, value) VALUES (?, ?)', artifacts)
+        self.conn.executemany('INSERT OR IGNORE INTO postings SELECT id, ? FROM artifacts WHERE kind = ? AND value = ?',
+                              [(rid, kind, value) for kind, value in artifacts])
+        return rid
+
+    def add(self, report):
+        """Archive one report; returns its id, or None if the same report is already stored."""
+        with self._lock, self.conn:
+            return self._add(report)
+
+    def add_many(self, reports, batch=ARCHIVE_BATCH):
+        """Archive a stream of reports, ARCHIVE_BATCH per transaction. Returns (added, duplicates)."""
+        added = duplicates = 0
+        reports = iter(reports)
+        while True:
+            with self._lock, self.conn:
+                n = 0
+                for report in reports:
+                    if self._add(report) is None:
+                        duplicates += 1
+                    else:
+                        added += 1
+                    n += 1
+                    if n == batch:
+                        break
+            if n < batch:
+                with self._lock:
+                    # fold the write-ahead log of a bulk import back into the database file
+                    self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+                return added, duplicates
+
+    def _matching_ids(self, criteria, latest):
+        """SQL and parameters selecting report ids that contain every (kind, value) in criteria."""
+        parts, params = [], []
+        for kind, value in criteria:
+            parts.append('SELECT p.report FROM postings p JOIN artifacts a ON a.id = p.artifact '
+                         'WHERE a.kind = ? AND a.value = ?')
+            params += [kind, archive_value(kind, value)]
+        if latest:
+            parts.append('SELECT report FROM latest')
+        return ' INTERSECT '.join(parts), params
+
+    def query(self, criteria, latest=False, limit=None):
+        """Reports containing every (kind, value) in criteria, newest first:
+        [{'id', 'targets', 'generated_at'}]. With latest, only the newest report of
+        each asset counts (what the asset looks like now, not at some point).
+        """
+        if not criteria:
+            return []
+        sql, params = self._matching_ids(criteria, latest)
+        sql = (f'SELECT id, asset, generated_at FROM reports WHERE id IN ({sql}) '
+               'ORDER BY generated_at DESC, id DESC')
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [{'id': rid, 'targets': json.loads(asset), 'generated_at': generated} for rid, asset, generated in rows]
+
+    def related(self, criteria, kind, latest=False):
+        """Values of `kind` found in the reports matching criteria, with report counts
+        (e.g. the domains sharing a nameserver): [(value, reports)], most frequent first.
+        """
+        sql, params = self._matching_ids(criteria, latest)
+        with self._lock:
+            return self.conn.execute(
+                # CROSS JOIN pins the join order: matching reports first, then their postings
+                f'SELECT a.value, COUNT(*) FROM ({sql}) m CROSS JOIN postings p ON p.report = m.report '
+                f'CROSS JOIN artifacts a ON a.id = p.artifact WHERE a.kind = ? '
+                f'GROUP BY a.value ORDER BY COUNT(*) DESC, a.value',
+                params + [kind]).fetchall()
+
+    def values(self, kind, prefix=None, limit=50):
+        """Most frequent indexed values of a kind: [(value, reports)]."""
+        sql = ('SELECT a.value, COUNT(*) FROM artifacts a JOIN postings p ON p.artifact = a.id WHERE a.kind = ?')
+        params = [kind]
+        if prefix:
+            sql += ' AND a.value >= ? AND a.value < ?'
+            prefix = archive_value(kind, prefix)
+            params += [prefix, prefix + '\uffff']
+        sql += ' GROUP BY a.id ORDER BY COUNT(*) DESC, a.value LIMIT ?'
+        with self._lock:
+            return self.conn.execute(sql, params + [int(limit)]).fetchall()
+
+    def get(self, report_id):
+        with self._lock:
+            row = self.conn.execute('SELECT codec, data FROM reports WHERE id = ?', (report_id,)).fetchone()
+            return self._unpack(*row) if row else None
+
+    def load_reports(self, ids):
+        for rid in ids:
+            report = self.get(rid)
+            if report is not None:
+                yield report
+
+    def subset(self, criteria, latest=False):
+        """EntityStore with the matching reports merged in."""
+        store = EntityStore()
+        for report in self.load_reports(r['id'] for r in self.query(criteria, latest=latest)):
+            store.add_report(report)
+        return store
+
+    def export(self, criteria, path, latest=False):
+        """Write the entities/links graph of the matching reports to path; returns the EntityStore."""
+        store = self.subset(criteria, latest=latest)
+        store.write(path)
+        return store
+
+    def stats(self):
+        with self._lock:
+            reports, size = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM reports').fetchone()
+            kinds = dict(self.conn.execute('SELECT kind, COUNT(*) FROM artifacts GROUP BY kind').fetchall())
+        return {'reports': reports, 'stored_bytes': size, 'artifacts': kinds}
+
+_archives = {}
+
+def get_archive(config):
+    """Return the shared ReportArchive for config['archive_path']."""
+    path = config.get('archive_path') or ARCHIVE_PATH
+    with _caches_lock:
+        if path not in _archives:
+            _archives[path] = ReportArchive(path)
+        return _archives[path]
+
+def parse_criteria(items):
+    """['ns=ns1.example.com', 'server=nginx'] -> [(kind, value)]."""
+    criteria = []
+    for item in items or []:
+        kind, sep, value = item.partition('=')
+        kind = kind.strip().lower()
+        if not sep or kind not in ARCHIVE_KINDS:
+            raise ValueError(f"criterio no válido: {item!r} (tipo=valor, tipos: {', '.join(ARCHIVE_KINDS)})")
+        criteria.append((kind, value))
+    return criteria
+
+# ------------------------- Flask UI ---------------------------------
 
 HTML_INDEX = '''
 <!doctype html>
@@ -239,49 +2796,283 @@ HTML_INDEX = '''
   <button type=submit>Run</button>
 </form>
 <hr>
-<p>También puedes POSTear JSON a /api/run con keys: email, domain, username y recibir JSON de vuelta.</p>
+<p>También puedes POSTear JSON a /api/run con keys: email, domain, username y recibir JSON de vuelta,
+o a /api/jobs para lanzarlo en segundo plano y seguir los resultados en /api/jobs/&lt;id&gt;/stream.</p>
+<div id=results></div>
+<script>
+// Con JavaScript el formulario lanza un job y pinta cada módulo en cuanto termina (SSE)
+document.querySelector('form').addEventListener('submit', async (ev) => {
+  ev.preventDefault();
+  const targets = {};
+  for (const [k, v] of new FormData(ev.target)) { if (v) targets[k] = v; }
+  const out = document.getElementById('results');
+  out.innerHTML = '';
+  const job = await (await fetch('/api/jobs', {method: 'POST', headers: {'Content-Type': 'application/json'},
+                                               body: JSON.stringify(targets)})).json();
+  const es = new EventSource(job.stream_url + '?format=sse');
+  es.addEventListener('module', (e) => {
+    const data = JSON.parse(e.data), pre = document.createElement('pre');
+    pre.textContent = JSON.stringify(data.module, null, 2);
+    out.appendChild(pre);
+  });
+  es.addEventListener('done', () => es.close());
+});
+</script>
 '''
 
-@app.route('/')
-def index():
-    return render_template_string(HTML_INDEX)
-
-@app.route('/run', methods=['POST'])
-def run_form():
-    email = request.form.get('email')
-    domain = request.form.get('domain')
-    username = request.form.get('username')
-    targets = {}
-    if email:
-        targets['email'] = email
-    if domain:
-        targets['domain'] = domain
-    if username:
-        targets['username'] = username
-    config = { 'hibp_api_key': None }
-    report = build_report(targets, config)
-    # store in session-free memory: return JSON and link to download
-    graphml = report_to_graphml(report)
-    buf = BytesIO(graphml)
-    # return page with JSON and download link (in-memory)
-    return jsonify(report)
-
-@app.route('/api/run', methods=['POST'])
-def api_run():
-    data = request.get_json() or {}
-    targets = {}
-    for k in ('email','domain','username'):
-        if k in data:
-            targets[k] = data[k]
-    config = data.get('config', {})
-    report = build_report(targets, config)
-    return jsonify(report)
-
-@app.route('/export/graphml', methods=['POST'])
-def export_graphml():
-    report = request.get_json() or {}
-    gm = report_to_graphml(report)
-    return send_file(BytesIO(gm), mimetype='application/xml', as_attachment=True, download_name='report.graphml')
+_app = None
+
+def create_app():
+    """Build the Flask app (imported lazily so batch/CLI runs never load Flask)."""
+    global _app
+    if _app is not None:
+        return _app
+    from flask import Flask, request, jsonify, render_template_string, Response, url_for
+    app = Flask(__name__)
+
+    @app.route('/')
+    def index():
+        return render_template_string(HTML_INDEX)
+
+    @app.route('/run', methods=['POST'])
+    def run_form():
+        email = request.form.get('email')
+        domain = request.form.get('domain')
+        username = request.form.get('username')
+        targets = {}
+        if email:
+            targets['email'] = email
+        if domain:
+            targets['domain'] = domain
+        if username:
+            targets['username'] = username
+        config = { 'hibp_api_key': None }
+        report = build_report(targets, config)
+        # GraphML is produced on demand by /export/graphml from this JSON
+        return jsonify(report)
+
+    @app.route('/api/run', methods=['POST'])
+    def api_run():
+        data = request.get_json() or {}
+        targets = {}
+        for k in target_keys(remote=True):
+            if k in data:
+                targets[k] = data[k]
+        config = remote_config(data.get('config'))
+        report = build_report(targets, config)
+        return jsonify(report)
+
+    @app.route('/api/jobs', methods=['POST'])
+    def api_jobs_submit():
+        data = request.get_json() or {}
+        targets = {k: data[k] for k in target_keys(remote=True) if k in data}
+        job, coalesced = jobs.submit(targets, remote_config(data.get('config')))
+        return jsonify({'job_id': job.id, 'state': job.state, 'coalesced': coalesced,
+                        'status_url': url_for('api_jobs_status', job_id=job.id),
+                        'stream_url': url_for('api_jobs_stream', job_id=job.id)}), 202
+
+    @app.route('/api/jobs/<job_id>')
+    def api_jobs_status(job_id):
+        job = jobs.get(job_id)
+        if not job:
+            return jsonify({'error': 'job not found'}), 404
+        return jsonify(job.snapshot())
+
+    @app.route('/api/jobs/<job_id>/stream')
+    def api_jobs_stream(job_id):
+        """Stream job events as NDJSON (default) or Server-Sent Events (?format=sse)."""
+        job = jobs.get(job_id)
+        if not job:
+            return jsonify({'error': 'job not found'}), 404
+        sse = request.args.get('format') == 'sse' or 'text/event-stream' in request.headers.get('Accept', '')
+
+        def generate():
+            for event in job.iter_events():
+                if event is None:
+                    if sse:
+                        yield ': keepalive\n\n'
+                    continue
+                line = json.dumps(event, ensure_ascii=False, default=str)
+                yield f"event: {event['event']}\ndata: {line}\n\n" if sse else line + '\n'
+
+        return Response(generate(), mimetype='text/event-stream' if sse else 'application/x-ndjson',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    @app.route('/api/cache/stats')
+    def cache_stats():
+        cache = get_cache({})
+        return jsonify(cache.stats() if cache else {})
+
+    @app.route('/api/archive')
+    def api_archive():
+        """Pivot over the report archive: /api/archive?ns=ns1.example.com&related=domain&latest=1
+        (&graph=1 returns the matching reports as an entities/links graph instead).
+        """
+        criteria = [(k, v) for k in ARCHIVE_KINDS for v in request.args.getlist(k)]
+        if not criteria:
+            return jsonify({'error': 'falta un criterio', 'kinds': list(ARCHIVE_KINDS)}), 400
+        archive = get_archive({})
+        latest = request.args.get('latest') in ('1', 'true')
+        if request.args.get('graph') in ('1', 'true'):
+            return jsonify(archive.subset(criteria, latest=latest).to_graph())
+        related = request.args.get('related')
+        if related:
+            return jsonify({'criteria': criteria, 'kind': related,
+                            'values': archive.related(criteria, related, latest=latest)})
+        return jsonify({'criteria': criteria,
+                        'reports': archive.query(criteria, latest=latest, limit=request.args.get('limit', type=int))})
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+    @app.route('/export/graphml', methods=['POST'])
+    def export_graphml():
+        report = request.get_json() or {}
+        return Response(iter_report_graphml(report), mimetype='application/xml',
+                        headers={'Content-Disposition': 'attachment; filename=report.graphml'})
+
+    _app = app
+    return app
+
+def __getattr__(name):
+    # `app` keeps working for flask/WSGI runners (`module.app`) without an eager import
+    if name == 'app':
+        return create_app()
+    raise AttributeError(name)
+
+# ------------------------- CLI ---------------------------------------
+
+def run_archive_command(args):
+    archive = get_archive({'archive_path': args.archive})
+    started = time.monotonic()
+    if args.action == 'import':
+        added = duplicates = 0
+        for path in args.input:
+            a, d = archive.add_many(iter_reports(path))
+            added, duplicates = added + a, duplicates + d
+        print(f'[+] {added} informes archivados ({duplicates} ya estaban) en {args.archive}')
+        return
+    if args.action == 'stats':
+        print(json.dumps(archive.stats(), indent=2))
+        return
+    if args.action == 'values':
+        rows = archive.values(args.kind, prefix=args.prefix, limit=args.limit)
+    else:
+        try:
+            criteria = parse_criteria(args.criteria)
+        except ValueError as e:
+            sys.exit(f'[-] {e}')
+        if args.action == 'export':
+            store = archive.export(criteria, args.output, latest=args.latest)
+            print(f'[+] {store.reports} informes -> {len(store.entities)} entidades y {len(store.links)} enlaces '
+                  f'en {args.output}')
+            return
+        if args.action == 'related':
+            rows = archive.related(criteria, args.kind, latest=args.latest)
+        else:
+            rows = [(r['generated_at'], json.dumps(r['targets'], ensure_ascii=False))
+                    for r in archive.query(criteria, latest=args.latest)]
+    for a, b in rows:
+        print(f'{a}\t{b}')
+    print(f'[+] {len(rows)} resultados en {(time.monotonic() - started) * 1000:.1f} ms', file=sys.stderr)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='OSINT Modular Tool')
+    sub = p.add_subparsers(dest='command')
+    serve = sub.add_parser('serve', help='UI web / API (por defecto)')
+    serve.add_argument('--port', type=int, default=5000)
+    batch = sub.add_parser('batch', help='procesa un CSV/JSONL de objetivos y escribe informes JSONL')
+    batch.add_argument('--input', required=True, help='CSV (email,domain,username) o JSONL')
+    batch.add_argument('--output', required=True, help='fichero JSONL de salida (se añade al final)')
+    batch.add_argument('--checkpoint', help='fichero de progreso (por defecto <output>.checkpoint)')
+    batch.add_argument('--workers', type=int, default=8, help='objetivos en paralelo')
+    batch.add_argument('--config', help='JSON con la config de los módulos')
+    batch.add_argument('--archive', nargs='?', const=ARCHIVE_PATH, help='guarda también los informes en el archivo')
+    mon = sub.add_parser('monitor', help='re-escaneo incremental: solo módulos caducados y solo los cambios')
+    mon.add_argument('--input', required=True, help='CSV (email,domain,username) o JSONL')
+    mon.add_argument('--output', required=True, help='fichero JSONL de deltas (se añade al final)')
+    mon.add_argument('--history', help=f'base de datos del histórico (por defecto {os.path.basename(HISTORY_PATH)})')
+    mon.add_argument('--workers', type=int, default=8, help='objetivos en paralelo')
+    mon.add_argument('--all', action='store_true', help='escribe también los deltas sin cambios')
+    mon.add_argument('--config', help='JSON con la config de los módulos (freshness, modules...)')
+    piv = sub.add_parser('pivot', help='pivota desde unos objetivos iniciales (MX, NS, CNAME, emails WHOIS...)')
+    for key in ('email', 'domain', 'username'):
+        piv.add_argument(f'--{key}')
+    piv.add_argument('--output', required=True, help='grafo entities/links JSON (o JSONL) resultante')
+    piv.add_argument('--reports', help='JSONL donde guardar también cada informe')
+    piv.add_argument('--depth', type=int, default=PIVOT_DEPTH, help='saltos desde los objetivos iniciales')
+    piv.add_argument('--fanout', type=int, default=PIVOT_FANOUT, help='nuevos objetivos como máximo por informe')
+    piv.add_argument('--max-targets', type=int, default=PIVOT_MAX_TARGETS, help='objetivos totales como máximo')
+    piv.add_argument('--scope', nargs='+', help="dominios permitidos (sufijos); '*' = cualquiera")
+    piv.add_argument('--config', help='JSON con la config de los módulos')
+    conv = sub.add_parser('convert', help='convierte informes en un grafo entities/links sin duplicados')
+    conv.add_argument('--input', required=True, nargs='+', help='informes JSON o JSONL (salida de batch)')
+    conv.add_argument('--output', required=True, help='grafo JSON (o JSONL) para los visualizadores')
+    arc = sub.add_parser('archive', help='archivo compacto de informes con índices para pivotar entre ellos')
+    arc.add_argument('--archive', default=ARCHIVE_PATH, help=f'base de datos (por defecto {os.path.basename(ARCHIVE_PATH)})')
+    asub = arc.add_subparsers(dest='action', required=True)
+    a_imp = asub.add_parser('import', help='añade informes JSON o JSONL (salida de batch)')
+    a_imp.add_argument('--input', required=True, nargs='+')
+    for name, help_text in (('query', 'informes que contienen todos los criterios'),
+                            ('related', 'valores de otro tipo presentes en esos informes'),
+                            ('export', 'grafo entities/links de esos informes')):
+        a = asub.add_parser(name, help=help_text)
+        a.add_argument('criteria', nargs='+', help=f"tipo=valor; tipos: {', '.join(ARCHIVE_KINDS)}")
+        a.add_argument('--latest', action='store_true', help='solo el informe más reciente de cada objetivo')
+        if name == 'related':
+            a.add_argument('--kind', required=True, choices=ARCHIVE_KINDS, help='tipo de valor a listar')
+        if name == 'export':
+            a.add_argument('--output', required=True, help='grafo JSON (o JSONL) para los visualizadores')
+    a_val = asub.add_parser('values', help='valores indexados más frecuentes de un tipo')
+    a_val.add_argument('kind', choices=ARCHIVE_KINDS)
+    a_val.add_argument('--prefix')
+    a_val.add_argument('--limit', type=int, default=50)
+    asub.add_parser('stats', help='informes, tamaño y artefactos indexados')
+    args = p.parse_args(argv)
+
+    if args.command in ('batch', 'monitor', 'pivot'):
+        config = {}
+        if args.config:
+            with open(args.config, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        config.setdefault('hibp_api_key', os.environ.get('HIBP_API_KEY'))
+    if args.command == 'batch':
+        if args.archive:
+            config['archive_path'] = args.archive
+        n = run_batch(args.input, args.output, config, workers=args.workers, checkpoint_path=args.checkpoint)
+        print(f'[+] Batch terminado: {n} informes nuevos en {args.output}')
+    elif args.command == 'pivot':
+        seeds = {k: getattr(args, k) for k in ('email', 'domain', 'username') if getattr(args, k)}
+        if not seeds:
+            p.error('pivot necesita al menos --email, --domain o --username')
+        config.update(pivot_depth=args.depth, pivot_fanout=args.fanout, pivot_max_targets=args.max_targets)
+        if args.scope:
+            config['pivot_scope'] = dict(config.get('pivot_scope') or {}, domains=args.scope)
+        out = open(args.reports, 'a', encoding='utf-8') if args.reports else None
+        try:
+            on_report = (lambda r: out.write(json.dumps(r, ensure_ascii=False, default=str) + '\n')) if out else None
+            result = pivot(seeds, config, on_report=on_report)
+        finally:
+            if out:
+                out.close()
+        write_graph(args.output, result['graph']['entities'], result['graph']['links'])
+        st = result['stats']
+        print(f"[+] Pivoting: {st['targets']} objetivos (profundidad {st['depth']}), {len(result['pivots'])} saltos, "
+              f"{st['out_of_scope']} fuera de alcance, {st['truncated']} descartados por límites -> {args.output}")
+    elif args.command == 'convert':
+        store = convert_reports(args.input, args.output)
+        print(f'[+] {store.reports} informes -> {len(store.entities)} entidades y {len(store.links)} enlaces en {args.output}')
+    elif args.command == 'archive':
+        run_archive_command(args)
+    elif args.command == 'monitor':
+        if args.history:
+            config['history_path'] = args.history
+        checked, written = run_monitor(args.input, args.output, config, workers=args.workers, all_deltas=args.all)
+        print(f'[+] Monitor terminado: {checked} objetivos revisados, {written} deltas en {args.output}')
+    else:
+        create_app().run(port=getattr(args, 'port', 5000), threaded=True)
 
 if __name__ == '__main__':
-    app.run(port=5000)
+    main()
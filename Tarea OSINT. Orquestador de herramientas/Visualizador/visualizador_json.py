@@ -9,168 +9,638 @@ Lee un archivo JSON con "entities" y "links" y genera:
 
 Uso:
   python visualizador_json.py --json ejemplo_orquestador.json
+  python visualizador_json.py --json investigacion_enorme.json --stream
+  python visualizador_json.py --json investigacion.jsonl
 """
 
 import json, argparse, csv
 import os
-import networkx as nx
+import re
+import math
+import queue
+import threading
+from itertools import chain, islice
 from graphviz import Digraph
-from xml.etree.ElementTree import Element, SubElement, ElementTree
+from xml.sax.saxutils import escape
+
+try:
+    import ijson  # parser incremental en C, opcional
+except ImportError:
+    ijson = None
 
 # --- Carga y normalización ---
 def load_json(path):
     with open(path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
+def normalize_entity(e):
+    return {
+        "id": e.get("id", ""),
+        "type": e.get("type", "Unknown"),
+        "value": e.get("value", ""),
+        "properties": e.get("properties", {})
+    }
+
+def normalize_link(l):
+    return {
+        "source": l.get("source"),
+        "target": l.get("target"),
+        "type": l.get("type", "related"),
+        "properties": l.get("properties", {})
+    }
+
 def normalize_entities(data):
-    ents = []
-    for e in data.get("entities", []):
-        ents.append({
-            "id": e.get("id", ""),
-            "type": e.get("type", "Unknown"),
-            "value": e.get("value", ""),
-            "properties": e.get("properties", {})
-        })
-    return ents
+    return [normalize_entity(e) for e in data.get("entities", [])]
 
 def normalize_links(data):
-    links = []
-    for l in data.get("links", []):
-        links.append({
-            "source": l.get("source"),
-            "target": l.get("target"),
-            "type": l.get("type", "related"),
-            "properties": l.get("properties", {})
-        })
-    return links
+    return [normalize_link(l) for l in data.get("links", [])]
 
-# --- Grafo visual SVG ---
-def generate_graph(entities, links, out_svg):
-    dot = Digraph(comment="Visualización de relaciones", format="svg")
-    for e in entities:
-        dot.node(e["id"], f'{e["value"]}\n({e["type"]})', shape="ellipse")
-    for l in links:
-        if l["source"] and l["target"]:
-            dot.edge(l["source"], l["target"], label=l["type"])
-    dot.render(out_svg, cleanup=True)
-    print(f"[+] Grafo generado: {out_svg}.svg")
+# --- Lectura en streaming (ficheros de varios GB) ---
+_WS = re.compile(r'[ \t\r\n]*')
 
-# --- Exportación CSV ---
-def export_csv(entities, links):
+def _scan_json_array(path, key, chunk_size=1 << 20):
     """
-    Exporta:
-      - entities.csv con columnas: id,type,value,<todas las propiedades detectadas>
-      - links.csv con columnas: source,target,type,<todas las propiedades detectadas en links>
+    Recorre el objeto JSON de nivel superior y va devolviendo uno a uno los
+    elementos de data[key] sin cargar el fichero en memoria (sin ijson).
+    Los demás arrays se recorren elemento a elemento y se descartan.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        st = {"buf": f.read(chunk_size), "pos": 0, "eof": False}
+
+        def fill():
+            chunk = f.read(chunk_size)
+            st["eof"] = not chunk
+            st["buf"] = st["buf"][st["pos"]:] + chunk
+            st["pos"] = 0
+
+        def peek():
+            while True:
+                st["pos"] = _WS.match(st["buf"], st["pos"]).end()
+                if st["pos"] < len(st["buf"]) or st["eof"]:
+                    return st["buf"][st["pos"]:st["pos"] + 1]
+                fill()
+
+        def decode():
+            while True:
+                try:
+                    value, end = decoder.raw_decode(st["buf"], st["pos"])
+                    # un número justo al final del buffer puede estar cortado
+                    if end == len(st["buf"]) and not st["eof"]:
+                        fill()
+                        continue
+                    st["pos"] = end
+                    return value
+                except json.JSONDecodeError:
+                    if st["eof"]:
+                        raise
+                    fill()
+
+        def array_items():
+            st["pos"] += 1  # '['
+            while True:
+                c = peek()
+                if c == ']':
+                    st["pos"] += 1
+                    return
+                if c == ',':
+                    st["pos"] += 1
+                    continue
+                yield decode()
+
+        if peek() != '{':
+            raise ValueError("El JSON debe ser un objeto con 'entities' y 'links'")
+        st["pos"] += 1
+        while True:
+            c = peek()
+            if c in ('}', ''):
+                return
+            if c == ',':
+                st["pos"] += 1
+                continue
+            name = decode()
+            if peek() != ':':
+                raise ValueError(f"JSON mal formado cerca de la clave {name!r}")
+            st["pos"] += 1
+            if peek() == '[':
+                items = array_items()
+                if name == key:
+                    yield from items
+                else:
+                    for _ in items:
+                        pass
+            else:
+                decode()
+
+def _is_jsonl(path):
+    return path.lower().endswith(('.jsonl', '.ndjson'))
+
+def iter_records(path, key):
+    """
+    Itera los registros crudos de 'entities' o 'links' en streaming.
+    - .jsonl/.ndjson: una entidad o un enlace por línea (los enlaces tienen
+      'source' y 'target', o "kind": "link").
+    - .json: usa ijson si está instalado y si no un lector incremental propio.
     """
-    # detectar keys dinámicas en entidades
-    ent_prop_keys = set()
+    if _is_jsonl(path):
+        want_links = key == "links"
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                kind = rec.pop("kind", None)
+                is_link = kind == "link" if kind else ("source" in rec and "target" in rec)
+                if is_link == want_links:
+                    yield rec
+    elif ijson is not None:
+        with open(path, 'rb') as f:
+            yield from ijson.items(f, f"{key}.item", use_float=True)
+    else:
+        yield from _scan_json_array(path, key)
+
+def stream_entities(path):
+    for e in iter_records(path, "entities"):
+        yield normalize_entity(e)
+
+def stream_links(path):
+    for l in iter_records(path, "links"):
+        yield normalize_link(l)
+
+def collect_property_keys(records):
+    """Claves de 'properties' presentes en una secuencia de entidades o enlaces (ordenadas)."""
+    keys = set()
+    for r in records:
+        keys.update((r.get("properties") or {}).keys())
+    return sorted(keys)
+
+class PropertyKeyCollector:
+    """
+    Deja pasar una secuencia de entidades o enlaces y, mientras otro la recorre,
+    cuenta los registros y anota sus claves de 'properties' (para no leerla dos veces).
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self.count = 0
+        self._keys = set()
+
+    def __iter__(self):
+        for r in self.records:
+            self.count += 1
+            self._keys.update((r.get("properties") or {}).keys())
+            yield r
+
+    @property
+    def keys(self):
+        return sorted(self._keys)
+
+# --- Nivel de detalle (grafos grandes) ---
+# Por encima de LOD_MAX_NODES entidades no se dibuja nodo a nodo: las entidades se
+# agrupan por tipo o por comunidad en clusters (con el número de miembros) y las
+# aristas entre clusters se suman. Los clusters indicados en `expand` se muestran
+# desplegados. A partir de SFDP_THRESHOLD nodos se usa sfdp en lugar de dot.
+LOD_MAX_NODES = 1500
+SFDP_THRESHOLD = 500
+
+def community_groups(entities, links):
+    """id de entidad -> comunidad ("c0", "c1"... de mayor a menor) con label propagation de networkx."""
+    import networkx as nx  # solo hace falta para agrupar por comunidad
+    G = nx.Graph()
+    G.add_nodes_from(e["id"] for e in entities)
+    G.add_edges_from((l["source"], l["target"]) for l in links if l["source"] and l["target"])
+    communities = sorted(nx.community.label_propagation_communities(G), key=len, reverse=True)
+    return {nid: f"c{i}" for i, members in enumerate(communities) for nid in members}
+
+def aggregate_graph(entities, links, group_by="type", expand=()):
+    """
+    Colapsa las entidades en clusters por tipo (group_by="type") o por comunidad
+    (group_by="community") y devuelve {"nodes": [...], "edges": [...]}, sin propiedades.
+    - cluster: {"id": "cluster:<grupo>", "label", "type", "count", "cluster": <grupo>}
+    - entidad (cluster desplegado): {"id", "label", "type", "count": 1, "group"}
+    - arista: {"source", "target", "type", "weight"} (enlaces sumados entre clusters)
+    Con group_by="type" entities y links pueden ser generadores (una sola pasada;
+    solo se guarda id -> grupo). Por comunidad se necesita el grafo completo.
+    """
+    expand = set(expand)
+    if group_by == "community":
+        entities, links = list(entities), list(links)
+        groups = community_groups(entities, links)
+        key = lambda e: groups.get(e["id"], "c?")
+    else:
+        key = lambda e: e["type"]
+
+    where = {}       # id de entidad -> id de nodo visible
+    clusters = {}    # grupo -> nodo cluster
+    nodes = []
     for e in entities:
-        props = e.get("properties") or {}
-        for k in props.keys():
-            ent_prop_keys.add(k)
-    ent_prop_keys = sorted(ent_prop_keys)
-
-    # escribir entities.csv
-    ent_headers = ["id", "type", "value"] + ent_prop_keys
-    with open("entities.csv", "w", newline='', encoding="utf-8") as fe:
-        w = csv.writer(fe)
-        w.writerow(ent_headers)
-        for e in entities:
-            props = e.get("properties") or {}
-            row = [e.get("id",""), e.get("type",""), e.get("value","")]
-            for k in ent_prop_keys:
-                v = props.get(k, "")
-                # convertir listas/dicts a JSON string
-                if isinstance(v, (list, dict)):
-                    v = json.dumps(v, ensure_ascii=False)
-                row.append(v)
-            w.writerow(row)
-
-    # detectar keys dinámicas en links
-    link_prop_keys = set()
+        g = key(e)
+        if g in expand:
+            where[e["id"]] = e["id"]
+            nodes.append({"id": e["id"], "label": str(e["value"]), "type": e["type"], "count": 1, "group": g})
+            continue
+        c = clusters.get(g)
+        if c is None:
+            c = clusters[g] = {"id": f"cluster:{g}", "label": g, "type": e["type"], "count": 0,
+                               "cluster": g, "types": {}, "internal_links": 0}
+        c["count"] += 1
+        c["types"][e["type"]] = c["types"].get(e["type"], 0) + 1
+        where[e["id"]] = c["id"]
+    for c in clusters.values():
+        # el tipo del cluster es el mayoritario (por comunidad puede haber varios)
+        c["type"] = max(c["types"], key=c["types"].get)
+        c["label"] = f'{c["cluster"]} ({c["count"]})' if group_by == "type" else \
+                     f'{c["cluster"]}: {c["type"]}… ({c["count"]})'
+
+    edges = {}
     for l in links:
-        props = l.get("properties") or {}
-        for k in props.keys():
-            link_prop_keys.add(k)
-    link_prop_keys = sorted(link_prop_keys)
-
-    link_headers = ["source", "target", "type"] + link_prop_keys
-    with open("links.csv", "w", newline='', encoding="utf-8") as fl:
-        w = csv.writer(fl)
-        w.writerow(link_headers)
+        src, dst = where.get(l["source"]), where.get(l["target"])
+        if not src or not dst:
+            continue
+        if src == dst and src.startswith("cluster:"):
+            clusters[src[len("cluster:"):]]["internal_links"] += 1
+            continue
+        k = (src, dst, l["type"])
+        edges[k] = edges.get(k, 0) + 1
+    return {
+        "nodes": list(clusters.values()) + nodes,
+        "edges": [{"source": s, "target": t, "type": ty, "weight": w} for (s, t, ty), w in edges.items()],
+    }
+
+def choose_engine(n_nodes, engine=None):
+    return engine or ("sfdp" if n_nodes > SFDP_THRESHOLD else "dot")
+
+def _new_digraph(engine, **kw):
+    dot = Digraph(comment="Visualización de relaciones", format="svg", engine=engine, **kw)
+    if engine == "sfdp":
+        # sfdp: layout por fuerzas multinivel, sin solapes y con aristas rectas (escala a decenas de miles)
+        dot.attr(overlap="prism", splines="false", outputorder="edgesfirst")
+    return dot
+
+def aggregated_digraph(graph, engine=None):
+    """
+    Digraph de Graphviz para un grafo agregado: tamaño del nodo y grosor de la arista
+    según el número de miembros. Los nodos se nombran n0, n1... (Graphviz interpreta
+    "a:b" en una arista como nodo:puerto).
+    """
+    dot = _new_digraph(choose_engine(len(graph["nodes"]), engine))
+    names = {}
+    for i, n in enumerate(graph["nodes"]):
+        names[n["id"]] = f"n{i}"
+        if "cluster" in n:
+            size = f'{0.6 + 0.4 * math.log10(n["count"] + 1):.2f}'
+            dot.node(f"n{i}", n["label"], shape="doublecircle", width=size, fixedsize="false")
+        else:
+            dot.node(f"n{i}", f'{n["label"]}\n({n["type"]})', shape="ellipse")
+    for ed in graph["edges"]:
+        label = ed["type"] if ed["weight"] == 1 else f'{ed["type"]} ×{ed["weight"]}'
+        dot.edge(names[ed["source"]], names[ed["target"]], label=label,
+                 penwidth=f'{1 + math.log10(ed["weight"]):.2f}')
+    return dot
+
+def layout_positions(graph, engine=None):
+    """
+    Posiciones precalculadas {id: (x, y)} con Graphviz (salida json0, sin dibujar).
+    Si Graphviz no está disponible se reparten los nodos en círculo.
+    """
+    try:
+        layout = json.loads(aggregated_digraph(graph, engine).pipe(format="json0"))
+        ids = {f"n{i}": n["id"] for i, n in enumerate(graph["nodes"])}
+        pos = {}
+        for obj in layout.get("objects", []):
+            if obj.get("name") in ids and "pos" in obj:
+                x, y = obj["pos"].split(",")[:2]
+                pos[ids[obj["name"]]] = (float(x), float(y))
+        return pos
+    except Exception:
+        n = max(len(graph["nodes"]), 1)
+        r = 40 * math.sqrt(n)
+        return {node["id"]: (r * math.cos(2 * math.pi * i / n), r * math.sin(2 * math.pi * i / n))
+                for i, node in enumerate(graph["nodes"])}
+
+# --- Grafo visual SVG ---
+def generate_graph(entities, links, out_svg, max_nodes=LOD_MAX_NODES, group_by="type", engine=None):
+    """
+    SVG con Graphviz. Si hay más de max_nodes entidades (0 = sin límite) se dibuja
+    la vista agregada por tipo/comunidad en lugar de cada nodo.
+    """
+    entities = iter(entities)
+    head = list(islice(entities, max_nodes + 1)) if max_nodes else list(entities)
+    if max_nodes and len(head) > max_nodes:
+        graph = aggregate_graph(chain(head, entities), links, group_by)
+        dot = aggregated_digraph(graph, engine)
+        print(f"[i] Grafo grande: {len(graph['nodes'])} clusters por {group_by} (motor {dot.engine})")
+    else:
+        dot = _new_digraph(choose_engine(len(head), engine))
+        for e in head:
+            dot.node(e["id"], f'{e["value"]}\n({e["type"]})', shape="ellipse")
         for l in links:
+            if l["source"] and l["target"]:
+                dot.edge(l["source"], l["target"], label=l["type"])
+    dot.render(out_svg, cleanup=True)
+    print(f"[+] Grafo generado: {out_svg}.svg")
+
+# --- Exportación en una sola pasada ---
+# Cada formato es un "writer" que escribe de forma incremental (sin construir el grafo
+# ni el árbol XML en memoria). export_all recorre entidades y enlaces una sola vez y
+# reparte los lotes a todos los writers, cada uno en su propio hilo.
+
+GRAPHML_NS = "http://graphml.graphdrawing.org/xmlns"
+EXPORT_BATCH = 2000
+
+def _attr(v):
+    # atributo XML entre comillas dobles, escapado como lo hace ElementTree
+    return '"' + escape(str(v), {'"': "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#09;"}) + '"'
+
+def _csv_value(v):
+    # convertir listas/dicts a JSON string
+    if isinstance(v, (list, dict)):
+        return json.dumps(v, ensure_ascii=False)
+    return v
+
+class CsvWriter:
+    """entities.csv (id,type,value,<propiedades>) y links.csv (source,target,type,<propiedades>)."""
+
+    def __init__(self, ent_prop_keys, link_prop_keys, entities_path="entities.csv", links_path="links.csv"):
+        self.ent_prop_keys = ent_prop_keys
+        self.link_prop_keys = link_prop_keys
+        self.paths = (entities_path, links_path)
+        self.fe = self.fl = None
+
+    def open(self):
+        self.fe = open(self.paths[0], "w", newline='', encoding="utf-8")
+        self.fl = open(self.paths[1], "w", newline='', encoding="utf-8")
+        self.we, self.wl = csv.writer(self.fe), csv.writer(self.fl)
+        self.we.writerow(["id", "type", "value"] + self.ent_prop_keys)
+        self.wl.writerow(["source", "target", "type"] + self.link_prop_keys)
+
+    def entities(self, batch):
+        for e in batch:
+            props = e.get("properties") or {}
+            self.we.writerow([e.get("id",""), e.get("type",""), e.get("value","")]
+                             + [_csv_value(props.get(k, "")) for k in self.ent_prop_keys])
+
+    def links(self, batch):
+        for l in batch:
             props = l.get("properties") or {}
-            row = [l.get("source",""), l.get("target",""), l.get("type","")]
-            for k in link_prop_keys:
-                v = props.get(k, "")
-                if isinstance(v, (list, dict)):
-                    v = json.dumps(v, ensure_ascii=False)
-                row.append(v)
-            w.writerow(row)
+            self.wl.writerow([l.get("source",""), l.get("target",""), l.get("type","")]
+                             + [_csv_value(props.get(k, "")) for k in self.link_prop_keys])
 
-    print("[+] Archivos CSV generados: entities.csv y links.csv (con propiedades dinámicas)")
+    def close(self):
+        self.fe.close()
+        self.fl.close()
+        print("[+] Archivos CSV generados: entities.csv y links.csv (con propiedades dinámicas)")
 
-# --- Exportación GraphML estándar ---
-def export_graphml(entities, links, filename="graph.graphml"):
-    G = nx.DiGraph()
-    for e in entities:
-        G.add_node(e["id"], label=e["value"], type=e["type"])
-    for l in links:
-        if l["source"] and l["target"]:
-            G.add_edge(l["source"], l["target"], relation=l["type"])
-    nx.write_graphml(G, filename)
-    print(f"[+] Archivo GraphML estándar generado: {filename}")
+class GraphMLWriter:
+    """GraphML estándar (mismas claves que escribía networkx: label/type en nodos, relation en aristas)."""
 
-# --- Exportación GraphML compatible con Maltego ---
-def export_graphml_maltego(entities, links, filename="graph_maltego.graphml"):
+    def __init__(self, filename):
+        self.filename = filename
+        self.seen = set()   # solo ids: evita nodos duplicados y crea los extremos que falten
+
+    def open(self):
+        self.f = open(self.filename, "w", encoding="utf-8")
+        self.f.write("<?xml version='1.0' encoding='utf-8'?>\n"
+                     f'<graphml xmlns="{GRAPHML_NS}" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+                     f'xsi:schemaLocation="{GRAPHML_NS} {GRAPHML_NS}/1.0/graphml.xsd">\n'
+                     '  <key id="d0" for="node" attr.name="label" attr.type="string" />\n'
+                     '  <key id="d1" for="node" attr.name="type" attr.type="string" />\n'
+                     '  <key id="d2" for="edge" attr.name="relation" attr.type="string" />\n'
+                     '  <graph edgedefault="directed">\n')
+
+    def _node(self, nid, label=None, ntype=None):
+        self.seen.add(nid)
+        if label is None:
+            return f'    <node id={_attr((nid))} />\n'
+        return (f'    <node id={_attr((nid))}>\n'
+                f'      <data key="d0">{escape(str(label))}</data>\n'
+                f'      <data key="d1">{escape(str(ntype))}</data>\n'
+                '    </node>\n')
+
+    def entities(self, batch):
+        out = []
+        for e in batch:
+            if e["id"] not in self.seen:
+                out.append(self._node(e["id"], e["value"], e["type"]))
+        self.f.write("".join(out))
+
+    def links(self, batch):
+        out = []
+        for l in batch:
+            if not (l["source"] and l["target"]):
+                continue
+            for end in (l["source"], l["target"]):
+                if end not in self.seen:
+                    out.append(self._node(end))
+            out.append(f'    <edge source={_attr((l["source"]))} target={_attr((l["target"]))}>\n'
+                       f'      <data key="d2">{escape(str(l["type"]))}</data>\n'
+                       '    </edge>\n')
+        self.f.write("".join(out))
+
+    def close(self):
+        self.f.write("  </graph>\n</graphml>\n")
+        self.f.close()
+        print(f"[+] Archivo GraphML estándar generado: {self.filename}")
+
+class MaltegoGraphMLWriter:
     """
-    Genera un archivo GraphML compatible con Maltego.
+    GraphML compatible con Maltego.
     Evita errores al importar o cierres inesperados.
     """
-    graphml = Element("graphml", xmlns="http://graphml.graphdrawing.org/xmlns")
-    graph = SubElement(graphml, "graph", edgedefault="directed")
 
-    # Nodos
-    for e in entities:
-        if not e.get("id"):  # Evitar IDs vacíos
-            continue
-        node = SubElement(graph, "node", id=str(e["id"]))
-        data_label = SubElement(node, "data", key="Label")
-        data_label.text = f'{e["value"]} ({e["type"]})'
+    def __init__(self, filename):
+        self.filename = filename
+        self.edge_index = 0
 
-    # Enlaces
-    for i, l in enumerate(links):
-        if not l.get("source") or not l.get("target"):
-            continue
-        edge = SubElement(graph, "edge", id=f"e{i}", source=str(l["source"]), target=str(l["target"]))
-        data_rel = SubElement(edge, "data", key="Label")
-        data_rel.text = l.get("type", "related")
+    def open(self):
+        self.f = open(self.filename, "w", encoding="utf-8")
+        self.f.write(f"<?xml version='1.0' encoding='utf-8'?>\n<graphml xmlns=\"{GRAPHML_NS}\">"
+                     '<graph edgedefault="directed">')
+
+    def entities(self, batch):
+        self.f.write("".join(
+            f'<node id={_attr(e["id"])}><data key="Label">{escape(str(e["value"]))} ({escape(str(e["type"]))})</data></node>'
+            for e in batch if e.get("id")))  # Evitar IDs vacíos
+
+    def links(self, batch):
+        out = []
+        for l in batch:
+            i = self.edge_index
+            self.edge_index += 1
+            if not l.get("source") or not l.get("target"):
+                continue
+            out.append(f'<edge id="e{i}" source={_attr((l["source"]))} target={_attr((l["target"]))}>'
+                       f'<data key="Label">{escape(str(l.get("type", "related")))}</data></edge>')
+        self.f.write("".join(out))
+
+    def close(self):
+        self.f.write("</graph></graphml>")
+        self.f.close()
+        print(f"[+] Archivo GraphML (Maltego compatible) generado: {self.filename}")
 
-    ElementTree(graphml).write(filename, encoding="utf-8", xml_declaration=True)
-    print(f"[+] Archivo GraphML (Maltego compatible) generado: {filename}")
+def _batches(records, size=EXPORT_BATCH):
+    batch = []
+    for r in records:
+        batch.append(r)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _writer_thread(writer, q, errors):
+    try:
+        writer.open()
+        while True:
+            item = q.get()
+            if item is None:
+                break
+            kind, batch = item
+            getattr(writer, kind)(batch)
+        writer.close()
+    except Exception as e:
+        errors.append(e)
+        while q.get() is not None:  # vaciar la cola para no bloquear al productor
+            pass
+
+def export_all(entities, links, writers, parallel=True):
+    """
+    Recorre entities y luego links una sola vez (pueden ser generadores) y los
+    escribe en todos los writers. Con parallel=True cada writer escribe su
+    fichero en un hilo propio, alimentado por una cola acotada de lotes.
+    """
+    if not parallel:
+        for w in writers:
+            w.open()
+        for kind, records in (("entities", entities), ("links", links)):
+            for batch in _batches(records):
+                for w in writers:
+                    getattr(w, kind)(batch)
+        for w in writers:
+            w.close()
+        return
+    errors = []
+    queues = [queue.Queue(maxsize=8) for _ in writers]
+    threads = [threading.Thread(target=_writer_thread, args=(w, q, errors), daemon=True)
+               for w, q in zip(writers, queues)]
+    for t in threads:
+        t.start()
+    try:
+        for kind, records in (("entities", entities), ("links", links)):
+            for batch in _batches(records):
+                for q in queues:
+                    q.put((kind, batch))
+    finally:
+        for q in queues:
+            q.put(None)
+        for t in threads:
+            t.join()
+    if errors:
+        raise errors[0]
+
+# --- Esquema de propiedades (pre-scan o sidecar) ---
+def load_schema(path, entities=None, links=None):
+    """
+    Claves de propiedades de entidades y enlaces, necesarias para la cabecera de los CSV.
+    - Con listas en memoria se calculan directamente.
+    - Con un fichero se hace una pre-lectura ligera (solo claves) y se guarda en
+      <fichero>.schema.json; si el sidecar existe y corresponde al mismo fichero
+      (tamaño y fecha), se reutiliza sin volver a leerlo.
+    """
+    if entities is not None and links is not None:
+        return collect_property_keys(entities), collect_property_keys(links)
+    st = os.stat(path)
+    sidecar = path + ".schema.json"
+    try:
+        with open(sidecar, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+        if schema.get("size") == st.st_size and schema.get("mtime") == st.st_mtime:
+            return schema["entity_keys"], schema["link_keys"]
+    except (OSError, ValueError, KeyError):
+        pass
+    ent_keys = collect_property_keys(stream_entities(path))
+    link_keys = collect_property_keys(stream_links(path))
+    save_schema(path, ent_keys, link_keys, st)
+    return ent_keys, link_keys
+
+def save_schema(path, ent_keys, link_keys, st=None):
+    """Guarda el esquema en <fichero>.schema.json para que load_schema no tenga que leerlo."""
+    st = st or os.stat(path)
+    try:
+        with open(path + ".schema.json", 'w', encoding='utf-8') as f:
+            json.dump({"size": st.st_size, "mtime": st.st_mtime, "entity_keys": ent_keys, "link_keys": link_keys}, f)
+    except OSError:
+        pass
+
+# --- Exportaciones individuales (compatibilidad) ---
+def export_csv(entities, links, ent_prop_keys=None, link_prop_keys=None):
+    """
+    Exporta:
+      - entities.csv con columnas: id,type,value,<todas las propiedades detectadas>
+      - links.csv con columnas: source,target,type,<todas las propiedades detectadas en links>
+    Si se pasan ent_prop_keys/link_prop_keys, entities y links pueden ser generadores
+    (se recorren una sola vez); si no, se detectan recorriendo las listas.
+    """
+    if ent_prop_keys is None:
+        ent_prop_keys = collect_property_keys(entities)
+    if link_prop_keys is None:
+        link_prop_keys = collect_property_keys(links)
+    export_all(entities, links, [CsvWriter(ent_prop_keys, link_prop_keys)], parallel=False)
+
+# --- Exportación GraphML estándar ---
+def export_graphml(entities, links, filename="graph.graphml"):
+    export_all(entities, links, [GraphMLWriter(filename)], parallel=False)
+
+# --- Exportación GraphML compatible con Maltego ---
+def export_graphml_maltego(entities, links, filename="graph_maltego.graphml"):
+    export_all(entities, links, [MaltegoGraphMLWriter(filename)], parallel=False)
 
 # --- Ejecución principal ---
 def main():
     p = argparse.ArgumentParser()
-    p.add_argument("--json", required=True, help="Ruta al archivo JSON del orquestador")
+    p.add_argument("--json", required=True, help="Ruta al archivo JSON (o JSONL) del orquestador")
+    p.add_argument("--stream", action="store_true",
+                   help="lee entities/links en streaming, sin cargar el fichero en memoria (automático con .jsonl)")
+    p.add_argument("--max-nodes", type=int, default=LOD_MAX_NODES,
+                   help=f"a partir de este número de entidades el SVG muestra clusters (0 = sin agrupar, por defecto {LOD_MAX_NODES})")
+    p.add_argument("--group-by", choices=["type", "community"], default="type",
+                   help="agrupación de la vista agregada: por tipo o por comunidad (networkx)")
+    p.add_argument("--engine", choices=["dot", "sfdp"],
+                   help=f"motor de Graphviz (por defecto dot, o sfdp con más de {SFDP_THRESHOLD} nodos)")
     args = p.parse_args()
 
-    data = load_json(args.json)
-    entities = normalize_entities(data)
-    links = normalize_links(data)
-
-    if not entities or not links:
-        print("[-] El JSON no contiene entidades o enlaces reconocibles.")
-        return
-
     # Salidas automáticas con el nombre del JSON
     base = os.path.splitext(os.path.basename(args.json))[0]
     svg_out = f"{base}_graph"
 
-    generate_graph(entities, links, svg_out)
-    export_csv(entities, links)
-    export_graphml(entities, links, f"{base}.graphml")
-    export_graphml_maltego(entities, links, f"{base}_maltego.graphml")
+    if args.stream or _is_jsonl(args.json):
+        # Dos pasadas en streaming: la del SVG, que de paso cuenta los registros y recoge las
+        # columnas de los CSV, y la de exportación. La memoria no depende del tamaño del fichero
+        ent_pass = PropertyKeyCollector(stream_entities(args.json))
+        link_pass = PropertyKeyCollector(stream_links(args.json))
+        generate_graph(ent_pass, link_pass, svg_out, args.max_nodes, args.group_by, args.engine)
+        if not ent_pass.count or not link_pass.count:
+            print("[-] El JSON no contiene entidades o enlaces reconocibles.")
+            return
+        ent_keys, link_keys = ent_pass.keys, link_pass.keys
+        save_schema(args.json, ent_keys, link_keys)
+        entities, links = stream_entities(args.json), stream_links(args.json)
+    else:
+        data = load_json(args.json)
+        entities = normalize_entities(data)
+        links = normalize_links(data)
+
+        if not entities or not links:
+            print("[-] El JSON no contiene entidades o enlaces reconocibles.")
+            return
+
+        generate_graph(entities, links, svg_out, args.max_nodes, args.group_by, args.engine)
+        ent_keys, link_keys = load_schema(args.json, entities, links)
+
+    # Una sola pasada por los datos: CSV, GraphML y GraphML Maltego se escriben a la vez
+    export_all(entities, links, [CsvWriter(ent_keys, link_keys),
+                                 GraphMLWriter(f"{base}.graphml"),
+                                 MaltegoGraphMLWriter(f"{base}_maltego.graphml")])
 
     print("\n[✔] Listo. Archivos generados:")
     print(f"    - {svg_out}.svg  (visualización)")
@@ -3,13 +3,27 @@
 Interfaz web básica para el visualizador JSON (OSINT)
 -----------------------------------------------------
 Permite subir un archivo JSON y visualizar su grafo con todas las propiedades.
+Los grafos grandes se muestran en un visor canvas: el servidor entrega el grafo
+(agregado en clusters) como JSON y las propiedades se piden al pulsar cada nodo.
+El SVG y el GraphML se generan en un pool de procesos y se guardan en una caché
+en memoria indexada por el sha256 del JSON: volver a subir el mismo fichero es inmediato.
 """
 
-from flask import Flask, render_template_string, request
+from flask import Flask, render_template_string, request, jsonify, send_file
+import io
+import os
 import json
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from graphviz import Digraph
 import networkx as nx
 
+from visualizador_json import (normalize_entities, normalize_links, aggregate_graph,
+                               layout_positions, LOD_MAX_NODES)
+
 app = Flask(__name__)
 
 TEMPLATE = """
@@ -23,6 +37,9 @@ TEMPLATE = """
     h1 { color: #333; }
     .graph { margin-top: 2em; }
     svg { width: 100%; height: auto; border: 1px solid #ccc; }
+    #viewer { display: flex; gap: 1em; }
+    #canvas { border: 1px solid #ccc; cursor: grab; }
+    #panel { width: 320px; max-height: 700px; overflow: auto; font-size: 13px; }
   </style>
 </head>
 <body>
@@ -30,22 +47,143 @@ TEMPLATE = """
   <form method="post" enctype="multipart/form-data">
     <label>Selecciona un archivo JSON:</label>
     <input type="file" name="jsonfile" accept=".json">
+    <select name="mode">
+      <option value="auto">Automático</option>
+      <option value="svg">SVG con propiedades</option>
+      <option value="canvas">Visor interactivo</option>
+    </select>
     <button type="submit">Visualizar</button>
   </form>
 
   {% if svg %}
     <div class="graph">
       <h2>Resultado:</h2>
+      {% if gid %}<p><a href="{{ url_for('download_graphml', gid=gid) }}">Descargar GraphML</a></p>{% endif %}
       {{ svg|safe }}
     </div>
   {% endif %}
+
+  {% if canvas %}
+    <div class="graph">
+      <h2>Resultado: <span id="info"></span></h2>
+      <p><a href="{{ url_for('download_graphml', gid=gid) }}">Descargar GraphML</a></p>
+      <div id="viewer">
+        <canvas id="canvas" width="1100" height="700"></canvas>
+        <aside id="panel">Pulsa un cluster para desplegarlo o una entidad para ver sus propiedades.</aside>
+      </div>
+    </div>
+    <script>
+    const GID = "{{ gid }}";
+    let groupBy = "{{ group_by }}", expand = new Set(), view = {nodes: [], edges: []};
+    let scale = 1, ox = 0, oy = 0, drag = null;
+    const cv = document.getElementById('canvas'), ctx = cv.getContext('2d');
+    const panel = document.getElementById('panel');
+    const esc = s => String(s).replace(/[&<>"]/g, c => ({'&':'&amp;','<':'&lt;','>':'&gt;','"':'&quot;'}[c]));
+
+    function color(t) { let h = 0; for (const c of String(t)) h = (h * 31 + c.charCodeAt(0)) % 360; return `hsl(${h},60%,55%)`; }
+    function radius(n) { return Math.min(5 + 3 * Math.sqrt(n.count), 40); }
+    function screen(n) { return [n.x * scale + ox, -n.y * scale + oy]; }  // Graphviz: y hacia arriba
+
+    async function load() {
+      const q = new URLSearchParams({group_by: groupBy});
+      expand.forEach(g => q.append('expand', g));
+      const r = await fetch(`/api/graph/${GID}?` + q);
+      const data = await r.json();
+      if (data.error) { panel.innerHTML = `<p style="color:red">${esc(data.error)}</p>`; return; }
+      view = data;
+      document.getElementById('info').textContent =
+        `${data.entities} entidades, ${data.nodes.length} nodos visibles (agrupado por ${data.group_by})`;
+      fit(); draw(); groupsPanel();
+    }
+
+    function fit() {
+      if (!view.nodes.length) return;
+      const xs = view.nodes.map(n => n.x), ys = view.nodes.map(n => n.y);
+      const w = Math.max(...xs) - Math.min(...xs) || 1, h = Math.max(...ys) - Math.min(...ys) || 1;
+      scale = 0.9 * Math.min(cv.width / w, cv.height / h);
+      ox = cv.width / 2 - (Math.min(...xs) + w / 2) * scale;
+      oy = cv.height / 2 + (Math.min(...ys) + h / 2) * scale;
+    }
+
+    function draw() {
+      ctx.clearRect(0, 0, cv.width, cv.height);
+      const pos = {};
+      view.nodes.forEach(n => pos[n.id] = screen(n));
+      ctx.strokeStyle = '#999'; ctx.globalAlpha = 0.4;
+      for (const e of view.edges) {
+        const a = pos[e.source], b = pos[e.target];
+        ctx.lineWidth = 1 + Math.log10(e.weight);
+        ctx.beginPath(); ctx.moveTo(a[0], a[1]); ctx.lineTo(b[0], b[1]); ctx.stroke();
+      }
+      ctx.globalAlpha = 1; ctx.font = '11px Arial'; ctx.fillStyle = '#222';
+      const labels = view.nodes.length < 300;
+      for (const n of view.nodes) {
+        const [x, y] = pos[n.id], r = radius(n);
+        ctx.fillStyle = color(n.type); ctx.beginPath(); ctx.arc(x, y, r, 0, 2 * Math.PI); ctx.fill();
+        if (n.cluster !== undefined) { ctx.strokeStyle = '#333'; ctx.lineWidth = 2; ctx.stroke(); }
+        if (labels || n.cluster !== undefined) { ctx.fillStyle = '#222'; ctx.fillText(n.label, x + r + 2, y + 4); }
+      }
+    }
+
+    function hit(mx, my) {
+      let best = null, bestD = Infinity;
+      for (const n of view.nodes) {
+        const [x, y] = screen(n), d = Math.hypot(x - mx, y - my);
+        if (d <= radius(n) + 2 && d < bestD) { best = n; bestD = d; }
+      }
+      return best;
+    }
+
+    function groupsPanel() {
+      if (!expand.size) return;
+      panel.innerHTML = '<b>Desplegados:</b><br>' + [...expand].map(g =>
+        `${esc(g)} <button data-group="${esc(g)}">colapsar</button>`).join('<br>');
+    }
+    panel.addEventListener('click', ev => {
+      if (ev.target.dataset.group === undefined) return;
+      expand.delete(ev.target.dataset.group); load();
+    });
+
+    async function details(n) {
+      const r = await fetch(`/api/graph/${GID}/node/${encodeURIComponent(n.id)}`);
+      const d = await r.json();
+      let html = `<h3>${esc(n.label)}</h3><i>${esc(n.type)}</i><table>`;
+      for (const [k, v] of Object.entries(d.properties || {}))
+        html += `<tr><td><b>${esc(k)}</b></td><td>${esc(typeof v === 'object' ? JSON.stringify(v) : v)}</td></tr>`;
+      html += '</table>';
+      if (d.links) html += '<h4>Enlaces</h4>' + d.links.map(l => esc(`${l.source} → ${l.target} (${l.type})`)).join('<br>');
+      panel.innerHTML = html;
+    }
+
+    cv.addEventListener('wheel', ev => {
+      ev.preventDefault();
+      const k = ev.deltaY < 0 ? 1.2 : 1 / 1.2;
+      ox = ev.offsetX - (ev.offsetX - ox) * k; oy = ev.offsetY - (ev.offsetY - oy) * k; scale *= k;
+      draw();
+    });
+    cv.addEventListener('mousedown', ev => drag = {x: ev.offsetX, y: ev.offsetY, moved: false});
+    cv.addEventListener('mousemove', ev => {
+      if (!drag) return;
+      ox += ev.offsetX - drag.x; oy += ev.offsetY - drag.y;
+      drag.moved = drag.moved || Math.abs(ev.offsetX - drag.x) + Math.abs(ev.offsetY - drag.y) > 2;
+      drag.x = ev.offsetX; drag.y = ev.offsetY; draw();
+    });
+    cv.addEventListener('mouseup', ev => {
+      const moved = drag && drag.moved; drag = null;
+      if (moved) return;
+      const n = hit(ev.offsetX, ev.offsetY);
+      if (!n) return;
+      if (n.cluster !== undefined) { expand.add(n.cluster); load(); } else { details(n); }
+    });
+    load();
+    </script>
+  {% endif %}
 </body>
 </html>
 """
 
 def generate_graph_from_json(data):
     dot = Digraph(format='svg')
-    G = nx.DiGraph()
 
     for e in data.get("entities", []):
         props = e.get("properties") or {}
@@ -57,29 +195,275 @@ def generate_graph_from_json(data):
 
         # Crear nodo como HTML
         dot.node(e["id"], label=f'<{label_html}>', shape="box", style="rounded", fontsize="12")
-        G.add_node(e["id"], label=e.get("value",""), type=e.get("type",""))
 
     for l in data.get("links", []):
         if l.get("source") and l.get("target"):
             dot.edge(l["source"], l["target"], label=l.get("type","related"))
+
+    return dot.pipe().decode("utf-8")
+
+def graphml_from_json(data):
+    """GraphML (bytes) del JSON, generado en memoria: cada subida tiene el suyo."""
+    G = nx.DiGraph()
+    for e in data.get("entities", []):
+        G.add_node(e["id"], label=e.get("value",""), type=e.get("type",""))
+    for l in data.get("links", []):
+        if l.get("source") and l.get("target"):
             G.add_edge(l["source"], l["target"], relation=l.get("type","related"))
+    buf = io.BytesIO()
+    nx.write_graphml(G, buf)
+    return buf.getvalue()
 
-    svg = dot.pipe().decode("utf-8")
-    nx.write_graphml(G, "web_graph.graphml")
-    return svg
+# --- Caché de renderizado y pool de procesos ---
+# Graphviz y networkx se ejecutan en otros procesos para que un grafo grande no
+# bloquee al resto de usuarios; el resultado queda en una LRU limitada en bytes.
+# Los procesos se crean con forkserver (spawn donde no existe): hacer fork del
+# servidor, que tiene varios hilos, puede dejar bloqueado al hijo.
+RENDER_WORKERS = min(4, os.cpu_count() or 1)
+RENDER_TIMEOUT = 300
+RENDER_CACHE_MAX_BYTES = 128 * 1024 * 1024
+
+def render_graph(raw, kind):
+    """Se ejecuta en el pool: JSON subido (bytes) -> SVG (str) o GraphML (bytes)."""
+    data = json.loads(raw)
+    return generate_graph_from_json(data) if kind == "svg" else graphml_from_json(data)
+
+class RenderCache:
+    """LRU en memoria de salidas ya generadas, indexada por (sha256 del JSON, formato)."""
+
+    def __init__(self, max_bytes=RENDER_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.items = OrderedDict()
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def touch(self, key):
+        """True si `key` está en caché (y pasa a ser la más reciente), sin contar acierto ni fallo."""
+        with self.lock:
+            if key not in self.items:
+                return False
+            self.items.move_to_end(key)
+            return True
+
+    def put(self, key, value):
+        with self.lock:
+            if key in self.items:
+                self.size -= len(self.items.pop(key))
+            self.items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes and len(self.items) > 1:
+                _, old = self.items.popitem(last=False)
+                self.size -= len(old)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.items), "bytes": self.size, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+render_cache = RenderCache()
+_render_pool = None
+_inflight = {}             # (sha256, formato) -> Future: subidas iguales simultáneas comparten un render
+_inflight_lock = threading.Lock()
+
+def _get_render_pool():
+    global _render_pool
+    with _inflight_lock:
+        if _render_pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _render_pool = ProcessPoolExecutor(max_workers=RENDER_WORKERS,
+                                               mp_context=multiprocessing.get_context(method))
+        return _render_pool
+
+def _render_done(key, fut):
+    if not fut.cancelled() and fut.exception() is None:
+        render_cache.put(key, fut.result())
+    with _inflight_lock:
+        _inflight.pop(key, None)
+
+def submit_render(gid, kind, raw):
+    """Lanza (o reutiliza si ya está en curso) el render de `kind` para la subida `gid`."""
+    pool = _get_render_pool()
+    key = (gid, kind)
+    with _inflight_lock:
+        fut = _inflight.get(key)
+        if fut is None:
+            fut = _inflight[key] = pool.submit(render_graph, raw, kind)
+            fut.add_done_callback(lambda f: _render_done(key, f))
+    return fut
+
+def render(gid, kind, raw):
+    """SVG o GraphML de una subida: de la caché o generado en el pool (esperando como mucho RENDER_TIMEOUT)."""
+    cached = render_cache.get((gid, kind))
+    if cached is not None:
+        return cached
+    return submit_render(gid, kind, raw).result(timeout=RENDER_TIMEOUT)
+
+# --- Grafos grandes: datos en JSON para el visor canvas ---
+# Con etiquetas HTML con todas las propiedades el SVG deja de ser manejable a partir
+# de unos cientos de nodos; por encima de WEB_SVG_MAX_NODES se usa el visor canvas.
+WEB_SVG_MAX_NODES = 300
+WEB_CANVAS_MAX_NODES = 20000
+UPLOADS_MAX_BYTES = 64 * 1024 * 1024   # tamaño de los JSON guardados (en memoria ocupan unas veces más)
+MAX_VIEWS = 32                          # vistas (group_by + clusters desplegados) memorizadas por subida
+NODE_LINKS_LIMIT = 200
+
+_uploads = OrderedDict()   # sha256 del JSON subido -> entidades, enlaces, índice por id y adyacencia
+_uploads_size = 0
+_uploads_lock = threading.Lock()
+
+def store_upload(raw):
+    """Guarda en memoria un JSON subido, identificado por su sha256. Es una LRU limitada por
+    el tamaño de los JSON (UPLOADS_MAX_BYTES); solo se conservan las entidades y enlaces
+    normalizados, con un índice por id y la lista de enlaces de cada entidad.
+    """
+    global _uploads_size
+    gid = hashlib.sha256(raw).hexdigest()
+    with _uploads_lock:
+        if gid in _uploads:
+            _uploads.move_to_end(gid)
+            return gid, _uploads[gid]
+    data = json.loads(raw)
+    entities = normalize_entities(data)
+    links = normalize_links(data)
+    del data
+    adjacency = {}
+    for l in links:
+        adjacency.setdefault(l["source"], []).append(l)
+        if l["target"] != l["source"]:
+            adjacency.setdefault(l["target"], []).append(l)
+    upload = {"entities": entities, "links": links, "index": {e["id"]: e for e in entities},
+              "adjacency": adjacency, "views": OrderedDict(), "size": len(raw)}
+    with _uploads_lock:
+        if gid not in _uploads:
+            _uploads[gid] = upload
+            _uploads_size += upload["size"]
+        while _uploads_size > UPLOADS_MAX_BYTES and len(_uploads) > 1:
+            _, old = _uploads.popitem(last=False)
+            _uploads_size -= old["size"]
+        return gid, _uploads.get(gid, upload)
+
+def default_group_by(upload):
+    return "none" if len(upload["entities"]) <= LOD_MAX_NODES else "type"
+
+def graph_view(upload, group_by, expand):
+    """Vista del grafo (agregada o no) con posiciones precalculadas por Graphviz, sin propiedades."""
+    key = (group_by, tuple(sorted(expand)))
+    views = upload["views"]
+    with _uploads_lock:
+        view = views.get(key)
+        if view is not None:
+            views.move_to_end(key)
+            return view
+    if group_by == "none":
+        # cada entidad es su propio nodo: todos los tipos "desplegados"
+        expand = {e["type"] for e in upload["entities"]}
+        graph = aggregate_graph(upload["entities"], upload["links"], "type", expand)
+    else:
+        graph = aggregate_graph(upload["entities"], upload["links"], group_by, expand)
+    if len(graph["nodes"]) > WEB_CANVAS_MAX_NODES:
+        return {"error": f"La vista tendría {len(graph['nodes'])} nodos (máximo {WEB_CANVAS_MAX_NODES}); "
+                         "colapsa algún cluster o agrupa por comunidad."}
+    # el layout (Graphviz) se calcula en el pool de render, no en el hilo de la petición
+    pos = _get_render_pool().submit(layout_positions, graph).result(timeout=RENDER_TIMEOUT)
+    for n in graph["nodes"]:
+        n["x"], n["y"] = pos.get(n["id"], (0.0, 0.0))
+        n.pop("types", None)
+    graph.update(group_by=group_by, entities=len(upload["entities"]))
+    with _uploads_lock:
+        views[key] = graph
+        while len(views) > MAX_VIEWS:
+            views.popitem(last=False)
+    return graph
+
+def _get_upload(gid):
+    with _uploads_lock:
+        return _uploads.get(gid)
 
 
 @app.route("/", methods=["GET", "POST"])
 def index():
     svg = None
+    gid = None
+    canvas = False
+    group_by = None
     if request.method == "POST" and "jsonfile" in request.files:
         file = request.files["jsonfile"]
+        mode = request.form.get("mode", "auto")
         try:
-            data = json.load(file)
-            svg = generate_graph_from_json(data)
+            raw = file.read()
+            # también con el SVG en caché: el enlace de descarga necesita la subida y su GraphML
+            gid, upload = store_upload(raw)
+            if not render_cache.touch((gid, "graphml")):
+                submit_render(gid, "graphml", raw)   # en segundo plano, para la descarga
+            # repetición de una subida ya dibujada: el SVG sale de la caché
+            svg = render_cache.get((gid, "svg")) if mode != "canvas" else None
+            if svg is None:
+                if mode == "svg" or (mode == "auto" and len(upload["entities"]) <= WEB_SVG_MAX_NODES):
+                    svg = render(gid, "svg", raw)
+                else:
+                    canvas = True
+                    group_by = default_group_by(upload)
         except Exception as e:
             svg = f"<p style='color:red;'>Error al procesar el JSON: {e}</p>"
-    return render_template_string(TEMPLATE, svg=svg)
+            gid = None
+            canvas = False
+    return render_template_string(TEMPLATE, svg=svg, gid=gid, canvas=canvas, group_by=group_by)
+
+@app.route("/graphml/<gid>")
+def download_graphml(gid):
+    """GraphML de una subida, servido desde memoria (caché o render en curso)."""
+    data = render_cache.get((gid, "graphml"))
+    if data is None:
+        upload = _get_upload(gid)
+        with _inflight_lock:
+            pending = _inflight.get((gid, "graphml"))
+        if pending is None and upload is None:
+            return jsonify({"error": "grafo no encontrado, vuelve a subir el JSON"}), 404
+        fut = pending or submit_render(gid, "graphml", json.dumps(
+            {"entities": upload["entities"], "links": upload["links"]}).encode("utf-8"))
+        data = fut.result(timeout=RENDER_TIMEOUT)
+    return send_file(io.BytesIO(data), mimetype="application/xml", as_attachment=True,
+                     download_name=f"grafo_{gid[:12]}.graphml")
+
+@app.route("/api/cache/stats")
+def render_cache_stats():
+    return jsonify(render_cache.stats())
+
+@app.route("/api/graph/<gid>")
+def api_graph(gid):
+    """Grafo en JSON para el visor: ?group_by=none|type|community&expand=<cluster>&expand=..."""
+    upload = _get_upload(gid)
+    if upload is None:
+        return jsonify({"error": "grafo no encontrado, vuelve a subir el JSON"}), 404
+    group_by = request.args.get("group_by") or default_group_by(upload)
+    if group_by not in ("none", "type", "community"):
+        return jsonify({"error": f"group_by no válido: {group_by}"}), 400
+    view = graph_view(upload, group_by, set(request.args.getlist("expand")))
+    return jsonify(view), 400 if "error" in view else 200
+
+@app.route("/api/graph/<gid>/node/<path:node_id>")
+def api_node(gid, node_id):
+    """Propiedades de una entidad (bajo demanda) y sus primeros NODE_LINKS_LIMIT enlaces."""
+    upload = _get_upload(gid)
+    if upload is None:
+        return jsonify({"error": "grafo no encontrado, vuelve a subir el JSON"}), 404
+    e = upload["index"].get(node_id)
+    if e is None:
+        return jsonify({"error": "nodo no encontrado"}), 404
+    links = upload["adjacency"].get(node_id, [])[:NODE_LINKS_LIMIT]
+    return jsonify({"id": e["id"], "type": e["type"], "value": e["value"],
+                    "properties": e["properties"], "links": links})
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
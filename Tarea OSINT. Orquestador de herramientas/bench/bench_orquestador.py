@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the OSINT orchestrator against local stub servers.
+
+Uso:
+  python bench/bench_orquestador.py suite                      # todo, escalas por defecto
+  python bench/bench_orquestador.py suite --targets 1 100 10000 --entities 100 1000000 --save r.json
+  python bench/bench_orquestador.py suite --compare r.json     # compara con una ejecución anterior
+  python bench/bench_orquestador.py username --services 256 --latency 0.05
+  python bench/bench_orquestador.py dns --subdomains 5000 --workers 64
+  python bench/bench_orquestador.py hibp --emails 50 --limit 20
+  python bench/bench_orquestador.py whois --domains 500 --jobs 32 --limit 8
+  python bench/bench_orquestador.py archive --reports 10000 --queries 200
+  python bench/bench_orquestador.py startup --runs 5
+"""
+
+import argparse
+import importlib.util
+import json
+import math
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stubs import StubHTTPServer, StubDNSServer, StubWHOISServer
+
+TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ORCHESTRATOR = os.path.join(TOOL_DIR, 'OSINT orquestador de herramientas bueno.py')
+VISUALIZER = os.path.join(TOOL_DIR, 'Visualizador', 'visualizador_json.py')
+
+def _load(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+def load_orchestrator():
+    return _load('osint_orchestrator', ORCHESTRATOR)
+
+def load_visualizer():
+    return _load('visualizador_json', VISUALIZER)
+
+# ------------------------- Scenarios ---------------------------------
+
+def bench_username(args):
+    """Services/second of module_username as the concurrency limit grows."""
+    osint = load_orchestrator()
+    with StubHTTPServer(latency=args.latency) as stub:
+        services = [{'name': f'svc{i}', 'url': f'{stub.url}/svc{i}/{{username}}', 'method': 'HEAD'}
+                    for i in range(args.services)]
+        print(f'{"concurrency":>12} {"seconds":>10} {"services/s":>12}')
+        for workers in args.concurrency:
+            config = {'username_services': services, 'username_workers': workers,
+                      'username_per_host': workers}
+            osint.module_username('warmup', dict(config, username_services=services[:workers]))
+            t0 = time.perf_counter()
+            result = osint.module_username('benchuser', config)
+            elapsed = time.perf_counter() - t0
+            assert len(result['found_on']) == args.services, 'stub did not answer every probe'
+            print(f'{workers:>12} {elapsed:>10.3f} {args.services / elapsed:>12.1f}')
+
+def bench_dns(args):
+    """module_dns (6 record types) and bulk subdomain resolution against a stub DNS server."""
+    osint = load_orchestrator()
+    domain = 'bench.test'
+    zone = {domain: {'A': ['192.0.2.1'], 'MX': ['10 mail.bench.test.'], 'NS': ['ns1.bench.test.'],
+                     'TXT': ['"v=spf1 -all"']}}
+    for i in range(0, args.subdomains, 2):
+        zone[f'sub{i}.{domain}'] = {'A': [f'192.0.2.{i % 250 + 1}']}
+    with StubDNSServer(zone, origin=domain) as stub:
+        config = {'dns_nameservers': ['127.0.0.1'], 'dns_port': stub.port, 'dns_workers': args.workers,
+                  'dns_qps': args.qps, 'cache': False}
+        for label in ('cold', 'warm'):
+            t0 = time.perf_counter()
+            result = osint.module_dns(domain, config)
+            print(f'module_dns ({label}): {time.perf_counter() - t0:.3f}s, '
+                  f'{sum(len(v) for v in result["records"].values())} records')
+        names = [f'sub{i}.{domain}' for i in range(args.subdomains)]
+        t0 = time.perf_counter()
+        found = osint.dns_bulk_resolve(names, config)
+        elapsed = time.perf_counter() - t0
+        print(f'bulk: {len(names)} names, {len(found)} found, {elapsed:.3f}s, {len(names) / elapsed:.0f} q/s, '
+              f'{stub.queries} queries reached the server')
+
+def bench_hibp(args):
+    """Many concurrent module_hibp jobs sharing one key against a rate-limited HIBP stub."""
+    osint = load_orchestrator()
+    with StubHTTPServer(hibp_limit=args.limit, hibp_window=1.0) as stub:
+        config = {'hibp_api_key': 'bench', 'hibp_base_url': stub.url + '/hibp', 'hibp_rpm': args.limit * 60,
+                  'hibp_join_catalog': True, 'cache': False}
+        emails = [f'user{i}@bench.test' for i in range(args.emails)]
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(lambda e: osint.module_hibp(e, config), emails))
+        elapsed = time.perf_counter() - t0
+        errors = sum(1 for r in results if r.get('error'))
+        calls = 2 * len(emails)
+        print(f'{len(emails)} emails / {calls} calls in {elapsed:.2f}s ({calls / elapsed:.1f} calls/s, '
+              f'limit {args.limit}/s), {stub.throttled} throttled by the stub, {errors} errors')
+
+def bench_whois(args):
+    """Concurrent WHOIS lookups against a stub server that throttles beyond `limit` connections:
+    the python-whois path (one raw query + inline parse per lookup, no limits) vs the WhoisEngine
+    (IANA/referral caching, per-server limit with backoff).
+    """
+    osint = load_orchestrator()
+    domains = [f'd{i}.test' for i in range(args.domains)]
+    print(f'{"engine":>22} {"seconds":>9} {"lookups/s":>10} {"queries":>8} {"throttled":>10} {"failed":>7}')
+    runs = [('python-whois', {'whois_engine': 'python-whois'}),
+            ('native', {})]
+    for label, extra in runs:
+        with StubWHOISServer(latency=args.latency, max_concurrent=args.limit) as stub:
+            config = dict({'cache': False, 'whois_workers': args.jobs, 'whois_per_server': args.limit,
+                           'whois_iana': f'127.0.0.1:{stub.port}'}, **extra)
+            if extra.get('whois_engine'):
+                config.update(whois_server='127.0.0.1', whois_port=stub.port)
+            osint.whois_bulk(['warmup.test'], config)
+            t0 = time.perf_counter()
+            results = osint.whois_bulk(domains, config)
+            elapsed = time.perf_counter() - t0
+            # a throttled answer parsed as a record is as useless as an error
+            bad = sum(1 for r in results.values() if not (r.get('whois_raw') or {}).get('domain_name'))
+            print(f'{label:>22} {elapsed:>9.3f} {len(domains) / elapsed:>10.1f} {stub.queries:>8} '
+                  f'{stub.throttled:>10} {bad:>7}')
+
+def archive_report(i):
+    """synthetic_report with artifacts shared by groups of reports (NS, MX, breach, server...)."""
+    report = synthetic_report(i)
+    report['generated_at'] = f'2024-01-01T00:00:{i % 60:02d}Z'
+    mods = {m['source']: m for m in report['modules']}
+    mods['haveibeenpwned']['breaches'] = [{'Name': f'Breach{i % 25}'}, {'Name': f'Breach{i % 7 + 25}'}]
+    mods['dns']['records'] = {'A': [f'198.51.{i % 200}.{i % 250 + 1}'], 'MX': [f'10 mx{i % 37}.mail.test.'],
+                              'NS': [f'ns{i % 100}.dns.test.', f'ns{i % 100 + 100}.dns.test.']}
+    mods['domain_meta']['http'] = {'title': f'Portal {i % 50}', 'status_code': 200, 'url': f'https://t{i}.bench.test/',
+                                   'headers': {'Server': f'nginx/1.{i % 20}', 'Content-Type': 'text/html; charset=utf-8',
+                                               'Strict-Transport-Security': 'max-age=31536000; includeSubDomains',
+                                               'Cache-Control': 'no-cache', 'X-Frame-Options': 'SAMEORIGIN'},
+                                   'meta': {'description': f'Portal {i % 50} de bench', 'generator': 'WordPress 6.4'}}
+    # the WHOIS record of a real report is most of its size
+    mods['whois']['whois_raw'].update({
+        'domain_name': f'T{i}.BENCH.TEST', 'whois_server': 'whois.bench.test', 'referral_url': 'http://www.bench.test',
+        'updated_date': '2024-01-01 00:00:00', 'creation_date': '2001-01-01 00:00:00',
+        'expiration_date': '2030-01-01 00:00:00', 'name_servers': [f'NS{i % 100}.DNS.TEST', f'NS{i % 100 + 100}.DNS.TEST'],
+        'status': ['clientTransferProhibited https://icann.org/epp#clientTransferProhibited',
+                   'clientUpdateProhibited https://icann.org/epp#clientUpdateProhibited'],
+        'emails': ['abuse@bench.test', f'admin@t{i}.bench.test'], 'dnssec': 'unsigned', 'name': 'REDACTED FOR PRIVACY',
+        'org': f'Org {i % 300}', 'address': 'REDACTED FOR PRIVACY', 'city': 'REDACTED FOR PRIVACY', 'state': 'Madrid',
+        'registrant_postal_code': 'REDACTED FOR PRIVACY', 'country': 'ES'})
+    mods['username']['found_on'] = [{'service': f'svc{j}', 'url': f'https://svc{j}.test/user{i}', 'status': 200}
+                                    for j in range(i % 5 + 1)]
+    return report
+
+def bench_archive(args):
+    """Pivot queries over `reports` archived reports vs scanning the same reports as a JSONL file."""
+    osint = load_orchestrator()
+    pivots = [lambda i: ('ns', f'ns{i % 100}.dns.test'), lambda i: ('mx', f'mx{i % 37}.mail.test'),
+              lambda i: ('breach', f'Breach{i % 25}'), lambda i: ('server', f'nginx/1.{i % 20}'),
+              lambda i: ('service', f'svc{i % 5}'), lambda i: ('ip', f'198.51.{i % 200}.{i % 250 + 1}')]
+    queries = [pivots[i % len(pivots)](i) for i in range(args.queries)]
+    with tempfile.TemporaryDirectory() as tmp:
+        jsonl = os.path.join(tmp, 'reports.jsonl')
+        with open(jsonl, 'w', encoding='utf-8') as f:
+            for i in range(args.reports):
+                f.write(json.dumps(archive_report(i)) + '\n')
+        archive = osint.ReportArchive(os.path.join(tmp, 'archive.sqlite3'))
+        t0 = time.perf_counter()
+        added, _ = archive.add_many(osint.iter_reports(jsonl))
+        elapsed = time.perf_counter() - t0
+        size = sum(os.path.getsize(os.path.join(tmp, n)) for n in os.listdir(tmp) if n.startswith('archive.sqlite3'))
+        print(f'import: {added} reports in {elapsed:.2f}s ({added / elapsed:.0f}/s); '
+              f'JSONL {os.path.getsize(jsonl) / 1e6:.1f} MB -> archive {size / 1e6:.1f} MB '
+              f'({archive.stats()["stored_bytes"] / 1e6:.1f} MB of compressed reports)')
+        lat, hits = [], 0
+        for kind, value in queries:
+            t0 = time.perf_counter()
+            hits += len(archive.query([(kind, value)]))
+            lat.append(time.perf_counter() - t0)
+        print(f'archive query: {len(queries)} queries, {hits} matches, p50 {percentile(lat, 0.5) * 1000:.2f} ms, '
+              f'p99 {percentile(lat, 0.99) * 1000:.2f} ms')
+        t0 = time.perf_counter()
+        related = archive.related([queries[0]], 'domain')
+        print(f'archive related ({queries[0][0]} -> domain): {len(related)} domains in '
+              f'{(time.perf_counter() - t0) * 1000:.2f} ms')
+        # the loose-files way: load and scan every report for one pivot
+        kind, value = queries[0]
+        t0 = time.perf_counter()
+        scanned = sum(1 for r in osint.iter_reports(jsonl)
+                      if (kind, osint.archive_value(kind, value)) in osint.report_artifacts(r))
+        print(f'JSONL scan ({kind}): {scanned} matches in {(time.perf_counter() - t0) * 1000:.0f} ms')
+
+# What the orchestrator imported at load time before the lazy module registry
+EAGER_IMPORTS = 'import requests, whois, dns.resolver, bs4, flask, xml.etree.ElementTree'
+
+STARTUP_CHILD = """
+import sys, time
+t0 = time.perf_counter()
+{eager}
+sys.path.insert(0, {bench!r})
+from bench_orquestador import load_orchestrator
+osint = load_orchestrator()
+report = osint.build_report({{'domain': 'bench.test'}},
+                            {{'modules': ['dns'], 'cache': False, 'dns_nameservers': ['127.0.0.1'], 'dns_port': {port}}})
+assert report['modules'][0]['records']['A'], report
+print(time.perf_counter() - t0)
+"""
+
+def bench_startup(args):
+    """Cold start of a fresh interpreter running only module_dns: lazy registry vs eager imports."""
+    bench_dir = os.path.dirname(os.path.abspath(__file__))
+    with StubDNSServer({'bench.test': {'A': ['192.0.2.1']}}, origin='bench.test') as stub:
+        print(f'{"mode":>8} {"process p50 (s)":>16} {"in-process p50 (s)":>19}')
+        for mode, eager in (('eager', EAGER_IMPORTS), ('lazy', '')):
+            code = STARTUP_CHILD.format(eager=eager, bench=bench_dir, port=stub.port)
+            wall, inner = [], []
+            for _ in range(args.runs):
+                t0 = time.perf_counter()
+                out = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True)
+                wall.append(time.perf_counter() - t0)
+                inner.append(float(out.stdout.strip().splitlines()[-1]))
+            print(f'{mode:>8} {statistics.median(wall):>16.3f} {statistics.median(inner):>19.3f}')
+
+# ------------------------- Suite -------------------------------------
+# Each (scenario, scale) runs in a fresh interpreter so peak RSS is per measurement.
+
+BENCH_DOMAIN = 'bench.test'
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p * len(ordered)) - 1)]
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+def _stub_config(http, dns_stub, whois_stub):
+    services = [{'name': f'svc{i}', 'url': f'{http.url}/u{i}/{{username}}', 'method': 'HEAD'} for i in range(10)]
+    return {'cache': False, 'hibp_api_key': 'bench', 'hibp_base_url': http.url + '/hibp', 'hibp_rpm': 600000,
+            'dns_nameservers': ['127.0.0.1'], 'dns_port': dns_stub.port,
+            'whois_server': '127.0.0.1', 'whois_port': whois_stub.port,
+            'username_services': services, 'meta_timeout': 5}
+
+def _stub_env(http):
+    # module_meta fetches http(s)://<target domain>/; route it to the HTTP stub acting as proxy
+    os.environ['HTTP_PROXY'] = os.environ['HTTPS_PROXY'] = http.url
+    os.environ['NO_PROXY'] = '127.0.0.1,localhost'
+
+def _targets(n):
+    return [{'email': f'user{i}@{BENCH_DOMAIN}', 'domain': f't{i}.{BENCH_DOMAIN}', 'username': f'user{i}'}
+            for i in range(n)]
+
+def _zone(n):
+    zone = {f't{i}.{BENCH_DOMAIN}': {'A': ['192.0.2.10'], 'MX': [f'10 mail.{BENCH_DOMAIN}.'],
+                                    'NS': [f'ns1.{BENCH_DOMAIN}.'], 'TXT': ['"v=spf1 -all"']} for i in range(n)}
+    zone[BENCH_DOMAIN] = {'A': ['192.0.2.1']}
+    return zone
+
+def _timed_map(func, items, workers):
+    latencies = []
+
+    def run(item):
+        t0 = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run, items))
+    return time.perf_counter() - t0, latencies
+
+def scenario_report(scale, workers):
+    """build_report for `scale` targets (email + domain + username), every module against stubs."""
+    osint = load_orchestrator()
+    with StubHTTPServer() as http, StubDNSServer(_zone(scale), origin=BENCH_DOMAIN) as d, StubWHOISServer() as w:
+        _stub_env(http)
+        config = _stub_config(http, d, w)
+        elapsed, lat = _timed_map(lambda t: osint.build_report(t, config), _targets(scale), workers)
+    return {'items': scale, 'seconds': elapsed, 'latencies': lat}
+
+def scenario_api(scale, workers):
+    """POST /api/run through the Flask app (test client, no sockets) for `scale` targets."""
+    osint = load_orchestrator()
+    app = osint.create_app()
+    with StubHTTPServer() as http, StubDNSServer(_zone(scale), origin=BENCH_DOMAIN) as d, StubWHOISServer() as w:
+        _stub_env(http)
+        config = _stub_config(http, d, w)
+
+        def post(targets):
+            r = app.test_client().post('/api/run', json=dict(targets, config=config))
+            assert r.status_code == 200, r.status_code
+
+        elapsed, lat = _timed_map(post, _targets(scale), workers)
+    return {'items': scale, 'seconds': elapsed, 'latencies': lat}
+
+def synthetic_report(i):
+    domain = f't{i}.{BENCH_DOMAIN}'
+    return {'targets': {'email': f'user{i}@{BENCH_DOMAIN}', 'domain': domain, 'username': f'user{i}'},
+            'modules': [
+                {'source': 'haveibeenpwned', 'email': f'user{i}@{BENCH_DOMAIN}', 'breaches': [{'Name': 'Breach1'}],
+                 'pastes': [], 'status': 'ok'},
+                {'source': 'whois', 'domain': domain, 'whois_raw': {'registrar': 'Bench Registrar, Inc.'}, 'status': 'ok'},
+                {'source': 'dns', 'domain': domain, 'records': {'A': ['192.0.2.10'], 'MX': [f'10 mail.{BENCH_DOMAIN}.'],
+                                                               'NS': [f'ns1.{BENCH_DOMAIN}.']}, 'status': 'ok'},
+                {'source': 'domain_meta', 'domain': domain, 'http': {'title': 'Stub', 'headers': {'Server': 'stub'}},
+                 'status': 'ok'},
+                {'source': 'username', 'username': f'user{i}', 'found_on': [
+                    {'service': 'GitHub', 'url': f'https://github.com/user{i}', 'status': 200}], 'status': 'ok'},
+            ]}
+
+def scenario_graphml(scale, workers):
+    """report_to_graphml over `scale` synthetic reports."""
+    osint = load_orchestrator()
+    reports = [synthetic_report(i) for i in range(scale)]
+    lat = []
+    t0 = time.perf_counter()
+    for report in reports:
+        t1 = time.perf_counter()
+        osint.report_to_graphml(report)
+        lat.append(time.perf_counter() - t1)
+    return {'items': scale, 'seconds': time.perf_counter() - t0, 'latencies': lat}
+
+def synthetic_graph(path, n_entities, seed=1):
+    """Write an entities/links JSON with n_entities entities and about as many links."""
+    rnd = random.Random(seed)
+    types = ['Person', 'Domain', 'Email', 'Username', 'IPv4Address', 'Breach']
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"entities": [')
+        for i in range(n_entities):
+            e = {'id': f'e{i}', 'type': types[i % len(types)], 'value': f'value-{i}',
+                 'properties': {'source': 'bench', f'prop{i % 7}': i}}
+            f.write((',' if i else '') + json.dumps(e))
+        f.write('], "links": [')
+        for i in range(n_entities):
+            l = {'source': f'e{i}', 'target': f'e{rnd.randrange(n_entities)}', 'type': 'related'}
+            f.write((',' if i else '') + json.dumps(l))
+        f.write(']}')
+
+def scenario_visualizer(scale, workers):
+    """visualizador_json: streaming read + single-pass CSV / GraphML / Maltego export for `scale` entities."""
+    viz = load_visualizer()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.json')
+        synthetic_graph(path, scale)
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            t0 = time.perf_counter()
+            ent_keys, link_keys = viz.load_schema(path)
+            viz.export_all(viz.stream_entities(path), viz.stream_links(path),
+                           [viz.CsvWriter(ent_keys, link_keys), viz.GraphMLWriter('bench.graphml'),
+                            viz.MaltegoGraphMLWriter('bench_maltego.graphml')], parallel=workers != 1)
+            elapsed = time.perf_counter() - t0
+        finally:
+            os.chdir(cwd)
+    return {'items': scale, 'seconds': elapsed, 'latencies': [elapsed]}
+
+SCENARIOS = {
+    'report': scenario_report,
+    'api': scenario_api,
+    'graphml': scenario_graphml,
+    'visualizer': scenario_visualizer,
+}
+
+def bench_child(args):
+    """Internal: run one (scenario, scale) and print its measurements as JSON."""
+    import contextlib
+    import io
+    with contextlib.redirect_stdout(io.StringIO()):
+        raw = SCENARIOS[args.scenario](args.scale, args.workers)
+    lat = raw['latencies']
+    print(json.dumps({'scenario': args.scenario, 'scale': args.scale, 'seconds': raw['seconds'],
+                      'throughput': raw['items'] / raw['seconds'] if raw['seconds'] else 0.0,
+                      'p50_ms': percentile(lat, 0.50) * 1000, 'p99_ms': percentile(lat, 0.99) * 1000,
+                      'peak_rss_mb': peak_rss_mb()}))
+
+def bench_suite(args):
+    """Run every scenario at every scale, each in its own process."""
+    plan = [(s, n) for s in ('report', 'api', 'graphml') if s in args.only for n in args.targets]
+    plan += [('visualizer', n) for n in args.entities if 'visualizer' in args.only]
+    previous = {}
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = {(r['scenario'], r['scale']): r for r in json.load(f)['results']}
+    print(f'{"scenario":>10} {"scale":>8} {"seconds":>9} {"items/s":>10} {"p50 ms":>9} {"p99 ms":>9} {"RSS MB":>8}'
+          + (f' {"vs prev":>8}' if previous else ''))
+    results = []
+    for scenario, scale in plan:
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '_child', scenario, str(scale),
+                              '--workers', str(args.workers)], capture_output=True, text=True)
+        if out.returncode != 0:
+            print(f'{scenario:>10} {scale:>8} FAILED: {out.stderr.strip().splitlines()[-1:]}')
+            continue
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        results.append(r)
+        line = (f'{scenario:>10} {scale:>8} {r["seconds"]:>9.2f} {r["throughput"]:>10.1f} '
+                f'{r["p50_ms"]:>9.1f} {r["p99_ms"]:>9.1f} {r["peak_rss_mb"]:>8.1f}')
+        prev = previous.get((scenario, scale))
+        if prev and prev['throughput']:
+            line += f' {100 * (r["throughput"] / prev["throughput"] - 1):>+7.1f}%'
+        print(line, flush=True)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'results': results}, f, indent=2)
+        print(f'[+] Resultados guardados en {args.save}')
+
+def main():
+    p = argparse.ArgumentParser(description='Benchmarks del orquestador OSINT')
+    sub = p.add_subparsers(dest='scenario', required=True)
+    u = sub.add_parser('username', help='module_username contra un servidor HTTP local')
+    u.add_argument('--services', type=int, default=256)
+    u.add_argument('--latency', type=float, default=0.05, help='latencia simulada por petición (s)')
+    u.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    u.set_defaults(func=bench_username)
+    d = sub.add_parser('dns', help='module_dns y resolución masiva contra un DNS local')
+    d.add_argument('--subdomains', type=int, default=5000)
+    d.add_argument('--workers', type=int, default=64)
+    d.add_argument('--qps', type=float, default=None, help='límite de consultas por segundo')
+    d.set_defaults(func=bench_dns)
+    h = sub.add_parser('hibp', help='module_hibp concurrente contra un HIBP local con rate limit')
+    h.add_argument('--emails', type=int, default=50)
+    h.add_argument('--jobs', type=int, default=16, help='trabajos concurrentes')
+    h.add_argument('--limit', type=int, default=20, help='peticiones/s que admite el stub')
+    h.set_defaults(func=bench_hibp)
+    w = sub.add_parser('whois', help='búsquedas WHOIS concurrentes contra un WHOIS local con límite de conexiones')
+    w.add_argument('--domains', type=int, default=500)
+    w.add_argument('--jobs', type=int, default=32, help='búsquedas concurrentes')
+    w.add_argument('--latency', type=float, default=0.02, help='latencia simulada por consulta (s)')
+    w.add_argument('--limit', type=int, default=8, help='conexiones simultáneas que admite el stub')
+    w.set_defaults(func=bench_whois)
+    a = sub.add_parser('archive', help='consultas de pivoting sobre el archivo de informes frente a escanear JSONL')
+    a.add_argument('--reports', type=int, default=10000)
+    a.add_argument('--queries', type=int, default=200)
+    a.set_defaults(func=bench_archive)
+    st = sub.add_parser('startup', help='arranque en frío de una ejecución de un solo módulo')
+    st.add_argument('--runs', type=int, default=5)
+    st.set_defaults(func=bench_startup)
+    su = sub.add_parser('suite', help='suite completa contra stubs locales (RSS, p50/p99, throughput)')
+    su.add_argument('--targets', type=int, nargs='+', default=[1, 10, 100], help='escalas de objetivos (hasta 10000)')
+    su.add_argument('--entities', type=int, nargs='+', default=[100, 10000, 100000],
+                    help='escalas de entidades para el visualizador (hasta 1000000)')
+    su.add_argument('--only', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    su.add_argument('--workers', type=int, default=16, help='informes concurrentes')
+    su.add_argument('--save', help='guarda los resultados en JSON')
+    su.add_argument('--compare', help='JSON de una ejecución anterior para comparar')
+    su.set_defaults(func=bench_suite)
+    ch = sub.add_parser('_child')
+    ch.add_argument('scenario', choices=list(SCENARIOS))
+    ch.add_argument('scale', type=int)
+    ch.add_argument('--workers', type=int, default=16)
+    ch.set_defaults(func=bench_child)
+    args = p.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
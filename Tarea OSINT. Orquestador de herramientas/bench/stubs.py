@@ -0,0 +1,273 @@
+"""
+Local stand-ins for the external sources used by the orchestrator (benchmarks only).
+Nothing here touches the network: every server binds to 127.0.0.1 on a free port.
+"""
+
+import json
+import socketserver
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import dns.message
+import dns.name
+import dns.rcode
+import dns.rdataclass
+import dns.rdatatype
+import dns.rrset
+
+# ------------------------- HTTP stub ---------------------------------
+
+FAVICON = bytes(range(256)) * 4
+PAGE_HEAD = (b'<html><head><title>Stub page</title><meta name="generator" content="stub">'
+             b'<link rel="icon" href="/favicon.ico"></head>')
+HUGE_PAGE = PAGE_HEAD + b'<body>' + b'<p>lorem ipsum</p>' * 300000 + b'</body></html>'   # ~5 MB
+
+class StubHTTPHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive, so connection pooling is measurable
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self, status, body=b'', content_type='text/html'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def _hibp(self):
+        server = self.server
+        with server.lock:
+            now = time.monotonic()
+            server.hibp_calls = [t for t in server.hibp_calls if now - t < server.hibp_window]
+            if len(server.hibp_calls) >= server.hibp_limit:
+                server.throttled += 1
+                retry_after = server.hibp_window - (now - server.hibp_calls[0])
+                self.send_response(429)
+                self.send_header('Retry-After', str(max(1, int(retry_after + 0.999))))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            server.hibp_calls.append(now)
+        if '/breaches' == self.path.split('?')[0][len('/hibp'):]:
+            body = [{'Name': f'Breach{i}', 'Title': f'Breach {i}', 'PwnCount': i * 1000} for i in range(10)]
+        elif '/breachedaccount/' in self.path:
+            body = [{'Name': 'Breach1'}, {'Name': 'Breach2'}]
+        else:
+            self._reply(404)
+            return
+        self._reply(200, json.dumps(body).encode(), 'application/json')
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        if self.path.startswith('http://'):
+            # request sent through the stub acting as HTTP proxy: serve the page for that host
+            self.path = '/' + self.path.split('/', 3)[3] if self.path.count('/') > 2 else '/'
+        if self.path.startswith('/hibp/'):
+            self._hibp()
+        elif self.path.startswith('/missing/'):
+            self._reply(404, b'not found')
+        elif self.path == '/favicon.ico':
+            self._reply(200, FAVICON, 'image/x-icon')
+        elif self.path.startswith('/huge'):
+            self._reply(200, HUGE_PAGE)
+        elif self.path.startswith('/slow'):
+            time.sleep(2)
+            self._reply(200, PAGE_HEAD + b'<body></body></html>')
+        else:
+            self._reply(200, b'<html><head><title>profile</title></head><body></body></html>')
+
+class _ThreadingHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        pass    # clients hanging up early (bounded reads) are expected
+
+class StubHTTPServer:
+    """Threaded HTTP server that answers every request after `latency` seconds.
+    Paths under /hibp/ mimic the HIBP v3 API with a sliding-window rate limit of
+    hibp_limit requests per hibp_window seconds (429 + Retry-After beyond it).
+    """
+
+    def __init__(self, handler=StubHTTPHandler, latency=0.0, hibp_limit=1000, hibp_window=1.0):
+        self.httpd = _ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.lock = threading.Lock()
+        self.httpd.hibp_limit = hibp_limit
+        self.httpd.hibp_window = hibp_window
+        self.httpd.hibp_calls = []
+        self.httpd.throttled = 0
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def throttled(self):
+        return self.httpd.throttled
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+# ------------------------- DNS stub ----------------------------------
+
+class StubDNSHandler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        data, sock = self.request
+        query = dns.message.from_wire(data)
+        response = dns.message.make_response(query)
+        question = query.question[0]
+        name = question.name.to_text().rstrip('.').lower()
+        rtype = dns.rdatatype.to_text(question.rdtype)
+        zone = self.server.zone
+        self.server.queries += 1
+        if name in zone and rtype in zone[name]:
+            response.answer.append(dns.rrset.from_text_list(question.name, 300, 'IN', rtype, zone[name][rtype]))
+        else:
+            if name not in zone:
+                response.set_rcode(dns.rcode.NXDOMAIN)
+            # SOA in the authority section lets resolvers cache the negative answer
+            origin = dns.name.from_text(self.server.origin)
+            response.authority.append(dns.rrset.from_text(
+                origin, 300, 'IN', 'SOA', f'ns1.{self.server.origin}. admin.{self.server.origin}. 1 3600 600 86400 300'))
+        sock.sendto(response.to_wire(), self.client_address)
+
+class StubDNSServer:
+    """UDP DNS server answering from an in-memory zone {name: {rtype: [rdata text]}}."""
+
+    def __init__(self, zone, origin='bench.test'):
+        self.server = socketserver.ThreadingUDPServer(('127.0.0.1', 0), StubDNSHandler)
+        self.server.daemon_threads = True
+        self.server.zone = {k.lower(): v for k, v in zone.items()}
+        self.server.origin = origin
+        self.server.queries = 0
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    @property
+    def queries(self):
+        return self.server.queries
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+# ------------------------- WHOIS stub --------------------------------
+
+WHOIS_RECORD = """Domain Name: {domain}
+Registry Domain ID: {n}_DOMAIN_COM-VRSN
+Registrar WHOIS Server: {referral}
+Registrar URL: http://www.bench.test
+Updated Date: 2024-01-01T00:00:00Z
+Creation Date: 2001-01-01T00:00:00Z
+Registry Expiry Date: 2030-01-01T00:00:00Z
+Registrar: Bench Registrar, Inc.
+Registrar Abuse Contact Email: abuse@bench.test
+Domain Status: clientTransferProhibited
+Name Server: NS1.{domain_upper}
+Name Server: NS2.{domain_upper}
+DNSSEC: unsigned
+Registrant Email: admin@{domain}
+>>> Last update of whois database: 2024-01-01T00:00:00Z <<<
+"""
+
+IANA_RECORD = """% IANA WHOIS server
+
+domain:       {tld}
+organisation: Bench Registry
+refer:        {refer}
+whois:        {refer}
+status:       ACTIVE
+"""
+
+WHOIS_LIMIT = "WHOIS LIMIT EXCEEDED - SEE WWW.BENCH.TEST/WHOIS_TOS\nPlease try again later.\n"
+
+class StubWHOISHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        srv = self.server
+        with srv.lock:
+            srv.active += 1
+            throttled = bool(srv.max_concurrent) and srv.active > srv.max_concurrent
+            if throttled:
+                srv.throttled += 1
+        try:
+            query = self.rfile.readline().decode('utf-8', errors='replace').strip().lower()
+            time.sleep(srv.latency)
+            srv.queries += 1
+            if throttled:
+                record = WHOIS_LIMIT
+            elif '.' not in query:
+                # a bare TLD is answered like whois.iana.org, referring back to this server
+                record = IANA_RECORD.format(tld=query, refer=srv.refer)
+            else:
+                record = WHOIS_RECORD.format(domain=query, domain_upper=query.upper(), n=abs(hash(query)) % 10**9,
+                                             referral=srv.referral or srv.refer)
+            self.wfile.write(record.replace('\n', '\r\n').encode('utf-8'))
+        finally:
+            with srv.lock:
+                srv.active -= 1
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    request_queue_size = 1024
+
+class StubWHOISServer:
+    """TCP WHOIS server (port 43 protocol) returning a canned registry record for any domain.
+    A bare TLD gets an IANA-style answer referring to this same server (as host:port), and
+    so does the record's "Registrar WHOIS Server" unless `referral` is given. With
+    max_concurrent set, connections beyond that limit get a rate-limit message instead.
+    """
+
+    def __init__(self, latency=0.0, max_concurrent=None, referral=None):
+        self.server = _ThreadingTCPServer(('127.0.0.1', 0), StubWHOISHandler)
+        self.server.daemon_threads = True
+        self.server.latency = latency
+        self.server.queries = 0
+        self.server.max_concurrent = max_concurrent
+        self.server.active = 0
+        self.server.throttled = 0
+        self.server.lock = threading.Lock()
+        self.server.refer = f'127.0.0.1:{self.port}'
+        self.server.referral = referral
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    @property
+    def queries(self):
+        return self.server.queries
+
+    @property
+    def throttled(self):
+        return self.server.throttled
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()